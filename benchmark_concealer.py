@@ -0,0 +1,464 @@
+import io
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import PIL
+import cryptography
+from PIL import Image
+from concealer_core import (ContainerHeader, DEFAULT_WORKERS, DEFAULT_SEGMENT_SIZE, FLAG_ENCRYPTED,
+                            KDF_PBKDF2_SHA256, PBKDF2_ITERATIONS, SALT_SIZE, CIPHER_AES_GCM_STREAM,
+                            NONCE_PREFIX_SIZE, MAX_BITS_PER_CHANNEL, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT,
+                            stream_key, encrypt_stream, decrypt_stream, load_image, save_image,
+                            conceal_image, reveal, conceal_payload, reveal_payload, embed_bits, extract_bits)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Minimum embed throughput expected on a 24-megapixel (6000x4000) RGB cover
+EMBED_TARGET_MBPS = 50.0
+
+# Suite matrix: cover sizes in megapixels and payload sizes
+SUITE_COVERS = (1, 12, 24, 50)
+SUITE_PAYLOADS = ('1K', '1M', '10M', '100M')
+
+# Stages timed for every suite case, in pipeline order
+SUITE_STAGES = ('read', 'kdf', 'encrypt', 'decode', 'embed', 'encode', 'extract', 'decrypt')
+
+# Default allowed throughput drop against a baseline before a stage counts as a regression
+REGRESSION_TOLERANCE = 0.15
+
+# Peak memory allowed for one conceal or reveal: per cover megapixel, the decoded
+# image (4 bytes per pixel) plus the pixel array (3 bytes per pixel) and some slack,
+# and a fixed allowance for codec and stream buffers
+PEAK_MB_PER_MEGAPIXEL = 8.0
+PEAK_MB_FIXED = 16.0
+
+_SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def benchmark_embed(width=6000, height=4000, repeat=3):
+    """Time embed_bits on a synthetic cover filled to capacity, return best MB/s"""
+    rng = np.random.default_rng(0)
+    cover = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    capacity = cover.size // 8
+    payload = rng.integers(0, 256, size=capacity, dtype=np.uint8).tobytes()
+
+    best = None
+    for _ in range(repeat):
+        img_array = cover.copy()
+        start = time.perf_counter()
+        embed_bits(img_array, payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return len(payload) / (1024 * 1024) / best
+
+
+def benchmark_scaling(width=6000, height=4000, worker_counts=(1, 2, 4, 8), bits_per_channel=1, repeat=3):
+    """Time parallel embed and extract for each worker count, return (workers, embed MB/s, extract MB/s)"""
+    rng = np.random.default_rng(0)
+    cover = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    capacity = cover.size * bits_per_channel // 8
+    payload = rng.integers(0, 256, size=capacity, dtype=np.uint8).tobytes()
+    megabytes = len(payload) / (1024 * 1024)
+
+    results = []
+    reference = None
+    for workers in worker_counts:
+        embed_time = extract_time = None
+        for _ in range(repeat):
+            img_array = cover.copy()
+            start = time.perf_counter()
+            embed_bits(img_array, payload, 0, bits_per_channel, workers)
+            elapsed = time.perf_counter() - start
+            embed_time = elapsed if embed_time is None else min(embed_time, elapsed)
+
+            start = time.perf_counter()
+            extracted = extract_bits(img_array, 0, len(payload), bits_per_channel, workers)
+            elapsed = time.perf_counter() - start
+            extract_time = elapsed if extract_time is None else min(extract_time, elapsed)
+
+        # Every worker count must produce exactly the same image and payload
+        if reference is None:
+            reference = img_array
+        if extracted != payload or not np.array_equal(img_array, reference):
+            raise AssertionError(f"Parallel output with {workers} workers differs from the serial path")
+        results.append((workers, megabytes / embed_time, megabytes / extract_time))
+
+    return results
+
+
+def parse_size(text):
+    """Parse a size such as 512, 1K, 10M or 1G into bytes"""
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in _SIZE_UNITS:
+        return int(float(text[:-1]) * _SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def cover_dimensions(megapixels):
+    """Return a 3:2 (width, height) with roughly the given number of megapixels"""
+    width = round(math.sqrt(megapixels * 1e6 * 1.5))
+    return width, round(megapixels * 1e6 / width)
+
+
+def make_cover(directory, megapixels):
+    """Write a reproducible noise PNG cover of the given size, reusing it if it exists"""
+    width, height = cover_dimensions(megapixels)
+    path = os.path.join(directory, f"cover_{width}x{height}.png")
+    if not os.path.exists(path):
+        rng = np.random.default_rng(width * height)
+        cover = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        Image.fromarray(cover).save(path, 'PNG', compress_level=1)
+    return path
+
+
+def make_payload(directory, size):
+    """Write a reproducible random payload of size bytes, reusing it if it exists"""
+    path = os.path.join(directory, f"payload_{size}.bin")
+    if not os.path.exists(path):
+        rng = np.random.default_rng(size)
+        with open(path, 'wb') as f:
+            for start in range(0, size, 1 << 24):
+                f.write(rng.integers(0, 256, size=min(1 << 24, size - start), dtype=np.uint8).tobytes())
+    return path
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it is not available"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _timed(stages, name, megabytes, function, *args):
+    """Run function, record its time and throughput under name and return its result"""
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    stages[name] = {'seconds': round(elapsed, 6),
+                    'mb_per_second': round(megabytes / elapsed, 2) if megabytes and elapsed else None}
+    return result
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _encode(img_array, output_format):
+    output = io.BytesIO()
+    save_image(Image.fromarray(img_array), output, output_format)
+    return output.getvalue()
+
+
+def synthetic_photo(width, height, seed=0):
+    """Return a smooth gradient cover with mild noise, closer to a photo than pure noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    cover = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    return (cover + rng.integers(0, 8, size=cover.shape)).clip(0, 255).astype(np.uint8)
+
+
+def benchmark_formats(width=6000, height=4000, formats=OUTPUT_FORMATS, repeat=1):
+    """Encode a concealed photo-like cover in every output format, return (format, seconds, MB, exact)"""
+    img_array = synthetic_photo(width, height)
+    rng = np.random.default_rng(1)
+    embed_bits(img_array, rng.integers(0, 256, size=img_array.size // 8, dtype=np.uint8).tobytes())
+
+    results = []
+    for output_format in formats:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = _encode(img_array, output_format)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        # The hidden bits only survive if the encoder is truly lossless
+        exact = np.array_equal(load_image(data), img_array)
+        results.append((output_format, best, len(data) / (1024 * 1024), exact))
+    return results
+
+
+def run_case(cover_path, payload_path, bits_per_channel=None, workers=DEFAULT_WORKERS,
+             output_format=DEFAULT_OUTPUT_FORMAT):
+    """Time every conceal and reveal stage for one cover/payload pair
+
+    Runs the same steps as ConcealThread and RevealThread, one stage at a
+    time. Payload stages report MB/s of payload and image stages MB/s of RGB
+    pixel data. When the payload does not fit the cover even at the maximum
+    bits per channel, only the payload stages are timed.
+    """
+    stages = {}
+    payload_mb = os.path.getsize(payload_path) / (1024 * 1024)
+    salt = os.urandom(SALT_SIZE)
+    nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+
+    payload = _timed(stages, 'read', payload_mb, _read_file, payload_path)
+    key = _timed(stages, 'kdf', None, stream_key, 'benchmark password', salt)
+    ciphertext = _timed(stages, 'encrypt', payload_mb,
+                        lambda: b''.join(encrypt_stream(key, nonce_prefix, [payload], DEFAULT_SEGMENT_SIZE)))
+
+    with Image.open(cover_path) as img:
+        width, height = img.size
+    pixel_mb = width * height * 3 / (1024 * 1024)
+
+    # Use the fewest bits per channel that hold the payload unless told otherwise
+    candidates = [bits_per_channel] if bits_per_channel else range(1, MAX_BITS_PER_CHANNEL + 1)
+    header = None
+    for bits in candidates:
+        candidate = ContainerHeader(len(ciphertext), FLAG_ENCRYPTED, KDF_PBKDF2_SHA256, PBKDF2_ITERATIONS,
+                                    salt, bits, cipher=CIPHER_AES_GCM_STREAM,
+                                    segment_size=DEFAULT_SEGMENT_SIZE, nonce_prefix=nonce_prefix)
+        if candidate.payload_offset + candidate.payload_channels <= width * height * 3:
+            header = candidate
+            break
+
+    png_data = None
+    extracted = ciphertext
+    if header is not None:
+        img_array = _timed(stages, 'decode', pixel_mb, load_image, cover_path)
+        _timed(stages, 'embed', payload_mb, conceal_payload, img_array, ciphertext, header, workers)
+        png_data = _timed(stages, 'encode', pixel_mb, _encode, img_array, output_format)
+        extracted = _timed(stages, 'extract', payload_mb, reveal_payload, img_array, header, workers)
+
+    plaintext = _timed(stages, 'decrypt', payload_mb,
+                       lambda: b''.join(decrypt_stream(key, nonce_prefix, [extracted], DEFAULT_SEGMENT_SIZE)))
+    if plaintext != payload:
+        raise AssertionError(f"Round trip of {payload_path} through {cover_path} did not match")
+
+    return {
+        'cover': f"{width}x{height}",
+        'megapixels': round(width * height / 1e6, 2),
+        'payload_bytes': len(payload),
+        'bits_per_channel': header.bits_per_channel if header else None,
+        'fits': header is not None,
+        'output_format': output_format,
+        'output_bytes': len(png_data) if png_data else None,
+        'workers': workers,
+        'stages': stages,
+        'total_seconds': round(sum(stage['seconds'] for stage in stages.values()), 6),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _in_fresh_process(function, *args):
+    """Run function in a newly spawned process and return its result
+
+    Linux carries the peak RSS of a parent over into the processes it
+    starts, so inputs are generated in their own processes too and the
+    parent never grows.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(function, *args).result()
+
+
+def run_suite(covers=SUITE_COVERS, payloads=SUITE_PAYLOADS, bits_per_channel=None, workers=DEFAULT_WORKERS,
+              output_format=DEFAULT_OUTPUT_FORMAT, work_dir=None):
+    """Run every cover/payload case, each in a fresh process so peak RSS is per case"""
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), 'concealer_benchmark')
+    os.makedirs(work_dir, exist_ok=True)
+
+    cases = {}
+    for megapixels in covers:
+        cover_path = _in_fresh_process(make_cover, work_dir, megapixels)
+        for payload in payloads:
+            payload_path = _in_fresh_process(make_payload, work_dir, parse_size(payload))
+            result = _in_fresh_process(run_case, cover_path, payload_path, bits_per_channel, workers,
+                                       output_format)
+            name = f"{megapixels}MP/{payload}"
+            cases[name] = result
+            note = "" if result['fits'] else "  (does not fit, payload stages only)"
+            print(f"{name:>12} {result['total_seconds']:>8.2f}s{note}", flush=True)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'cryptography': cryptography.__version__,
+        },
+        'cases': cases,
+    }
+
+
+def compare_results(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    """Return (case, stage, baseline, current, unit) for each stage slower than tolerance allows
+
+    Stages are compared by MB/s, or by seconds when they have no throughput
+    figure, like the KDF.
+    """
+    regressions = []
+    for name, case in current['cases'].items():
+        base_case = baseline['cases'].get(name)
+        if base_case is None:
+            continue
+        for stage, timing in case['stages'].items():
+            base_timing = base_case['stages'].get(stage)
+            if not base_timing:
+                continue
+            if base_timing['mb_per_second'] and timing['mb_per_second']:
+                if timing['mb_per_second'] < base_timing['mb_per_second'] * (1 - tolerance):
+                    regressions.append((name, stage, base_timing['mb_per_second'], timing['mb_per_second'], 'MB/s'))
+            elif base_timing['seconds']:
+                # The same allowance as for throughput: a 15% drop in MB/s takes 1/0.85 times as long
+                if timing['seconds'] > base_timing['seconds'] / (1 - tolerance):
+                    regressions.append((name, stage, base_timing['seconds'], timing['seconds'], 's'))
+    return regressions
+
+
+def _memory_case(operation, cover_path, payload_path, output_path):
+    """Run one conceal or reveal and return how much it raised the peak RSS in MB"""
+    before = _peak_rss_mb()
+    if operation == 'conceal':
+        save_image(conceal_image(payload_path, cover_path, 'benchmark password', workers=1), output_path)
+    else:
+        reveal(output_path, 'benchmark password', workers=1)
+    return _peak_rss_mb() - before
+
+
+def benchmark_memory(megapixels=24, work_dir=None):
+    """Return the peak MB used by conceal and reveal, each measured in a fresh process"""
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), 'concealer_benchmark')
+    os.makedirs(work_dir, exist_ok=True)
+    cover_path = _in_fresh_process(make_cover, work_dir, megapixels)
+    payload_path = _in_fresh_process(make_payload, work_dir, parse_size('64K'))
+    output_path = os.path.join(work_dir, 'memory_concealed.png')
+
+    return {operation: _in_fresh_process(_memory_case, operation, cover_path, payload_path, output_path)
+            for operation in ('conceal', 'reveal')}
+
+
+def print_suite(results):
+    """Print a per-stage MB/s table for suite results (the KDF is shown in milliseconds)"""
+    print(f"{'case':>12} " + ' '.join(f"{stage:>10}" for stage in SUITE_STAGES) + f" {'peak MB':>9}")
+    for name, case in results['cases'].items():
+        cells = []
+        for stage in SUITE_STAGES:
+            timing = case['stages'].get(stage)
+            if timing is None:
+                cells.append(f"{'-':>10}")
+            elif timing['mb_per_second'] is None:
+                cells.append(f"{timing['seconds'] * 1000:>8.0f}ms")
+            else:
+                cells.append(f"{timing['mb_per_second']:>10.1f}")
+        peak = f"{case['peak_rss_mb']:>9.1f}" if case['peak_rss_mb'] is not None else f"{'-':>9}"
+        print(f"{name:>12} " + ' '.join(cells) + " " + peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="File Concealer throughput benchmark")
+    parser.add_argument('--width', type=int, default=6000, help="Cover width in pixels")
+    parser.add_argument('--height', type=int, default=4000, help="Cover height in pixels")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is kept)")
+    parser.add_argument('--scaling', action='store_true',
+                        help="Measure parallel embed/extract with 1, 2, 4 and 8 workers")
+    parser.add_argument('--bits', type=int, default=None,
+                        help="Bits per channel for --scaling (default 1) or --suite (default: fewest that fit)")
+    parser.add_argument('--suite', action='store_true',
+                        help="Time every conceal/reveal stage over a matrix of covers and payloads")
+    parser.add_argument('--covers', default=','.join(str(mp) for mp in SUITE_COVERS),
+                        help="Comma-separated cover sizes in megapixels for --suite")
+    parser.add_argument('--payloads', default=','.join(SUITE_PAYLOADS),
+                        help="Comma-separated payload sizes (e.g. 1K,1M,100M) for --suite")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Embed/extract threads for --suite")
+    parser.add_argument('--format', default=DEFAULT_OUTPUT_FORMAT, choices=list(OUTPUT_FORMATS),
+                        help="Output encoder timed by --suite")
+    parser.add_argument('--memory', action='store_true',
+                        help=f"Check conceal/reveal peak memory against {PEAK_MB_PER_MEGAPIXEL:.0f} MB per megapixel "
+             f"plus {PEAK_MB_FIXED:.0f} MB")
+    parser.add_argument('--formats', action='store_true',
+                        help="Compare encode time and file size of every output format")
+    parser.add_argument('--json', help="Write suite results to this JSON file")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare suite results with a saved JSON file")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="Allowed throughput drop against the baseline (default: 0.15)")
+    args = parser.parse_args()
+
+    if args.suite:
+        covers = [float(mp) if '.' in mp else int(mp) for mp in args.covers.split(',')]
+        results = run_suite(covers, args.payloads.split(','), args.bits, args.workers, args.format)
+        print()
+        print_suite(results)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results: {args.json}")
+
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                regressions = compare_results(json.load(f), results, args.tolerance)
+            for name, stage, before, after, unit in regressions:
+                if unit == 's':
+                    print(f"❌ {name} {stage}: {before * 1000:.0f} -> {after * 1000:.0f} ms")
+                else:
+                    print(f"❌ {name} {stage}: {before:.1f} -> {after:.1f} MB/s")
+            if regressions:
+                return 1
+            print(f"✅ No stage is more than {args.tolerance:.0%} slower than the baseline")
+        return 0
+
+    args.bits = args.bits or 1
+    megapixels = args.width * args.height / 1e6
+    if args.memory:
+        if resource is None:
+            print("⚠️ Peak memory cannot be measured on this platform")
+            return 0
+        width, height = cover_dimensions(megapixels)
+        megapixels = width * height / 1e6
+        limit = PEAK_MB_PER_MEGAPIXEL * megapixels + PEAK_MB_FIXED
+        results = benchmark_memory(megapixels)
+        for operation, peak in results.items():
+            print(f"{operation}: peak {peak:.1f} MB on a {megapixels:.1f} MP cover "
+                  f"({peak / megapixels:.2f} MB per megapixel, limit {limit:.1f} MB)")
+        if max(results.values()) > limit:
+            print("❌ Peak memory is above the limit")
+            return 1
+        print("✅ Peak memory is within the limit")
+        return 0
+
+    if args.formats:
+        print(f"Output formats on a {megapixels:.1f} MP concealed image "
+              f"(raw pixels: {args.width * args.height * 3 / (1024 * 1024):.1f} MB)")
+        print(f"{'format':>12} {'seconds':>9} {'size MB':>9} {'MB/s':>8} {'lossless':>9}")
+        for output_format, seconds, size, exact in benchmark_formats(args.width, args.height, repeat=args.repeat):
+            mbps = args.width * args.height * 3 / (1024 * 1024) / seconds
+            print(f"{output_format:>12} {seconds:>9.2f} {size:>9.1f} {mbps:>8.1f} {'yes' if exact else 'NO':>9}")
+        return 0
+
+    if args.scaling:
+        print(f"Parallel scaling on a {megapixels:.1f} MP cover, {args.bits} bit(s) per channel")
+        print(f"{'workers':>8} {'embed MB/s':>12} {'extract MB/s':>14} {'speedup':>8}")
+        results = benchmark_scaling(args.width, args.height, bits_per_channel=args.bits, repeat=args.repeat)
+        for workers, embed_mbps, extract_mbps in results:
+            print(f"{workers:>8} {embed_mbps:>12.1f} {extract_mbps:>14.1f} {embed_mbps / results[0][1]:>7.2f}x")
+        return 0
+
+    mbps = benchmark_embed(args.width, args.height, args.repeat)
+    print(f"embed: {mbps:.1f} MB/s on a {megapixels:.1f} MP cover (target {EMBED_TARGET_MBPS:.0f} MB/s)")
+
+    if mbps < EMBED_TARGET_MBPS:
+        print("❌ Embed throughput is below target")
+        return 1
+    print("✅ Embed throughput meets target")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concealer_core import (ConcealerError, DEFAULT_WORKERS, PBKDF2_ITERATIONS, SCRYPT_COST, SALT_SIZE,
+                            KDF_NAMES, KDF_SCRYPT, COMPRESSION_NAMES, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT,
+                            KdfParams, KeyCache, conceal_image, conceal_split, reveal_to_file, reveal_split_to_file,
+                            save_image, output_extension, read_image_header, calibrate_kdf)
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+# Derived keys cached by each worker process for the lifetime of one batch
+_key_cache = None
+
+
+def _init_worker(seed):
+    """Create the worker's key cache, pre-filled with the batch key if one was derived up front"""
+    global _key_cache
+    _key_cache = KeyCache()
+    if seed is not None:
+        _key_cache.seed(*seed)
+
+
+def _list_files(directory, extensions=None):
+    """Return the sorted regular files in directory, optionally filtered by extension"""
+    names = sorted(os.listdir(directory))
+    paths = [os.path.join(directory, name) for name in names]
+    return [path for path in paths
+            if os.path.isfile(path) and (extensions is None or path.lower().endswith(extensions))]
+
+
+def _read_manifest(path, columns):
+    """Read a CSV manifest with a header row, requiring the given columns"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in columns if column not in (reader.fieldnames or [])]
+        if missing:
+            raise SystemExit(f"Manifest {path} is missing column(s): {', '.join(missing)}")
+
+        rows = []
+        for row in reader:
+            # Relative paths in a manifest are relative to the manifest itself
+            for column in columns + ['output']:
+                if row.get(column):
+                    row[column] = os.path.join(base_dir, row[column])
+            rows.append(row)
+        return rows
+
+
+def _check_outputs(jobs, source, target):
+    """Stop before the batch starts if two jobs would write the same file, since one would replace the other"""
+    seen = {}
+    for job in jobs:
+        path = target(job)
+        if path in seen:
+            raise SystemExit(f"{seen[path]} and {job[source]} would both be written to {path}, "
+                             f"give them different 'output' values in a manifest")
+        seen[path] = job[source]
+
+
+def _conceal_target(job):
+    return os.path.normcase(os.path.abspath(job['output']))
+
+
+def _reveal_target(job):
+    """Where reveal_to_file writes a job's file; in a directory the extension is only known afterwards"""
+    output = os.path.abspath(job['output'])
+    if os.path.isdir(output):
+        output = os.path.join(output, f"{os.path.splitext(os.path.basename(job['image']))[0]}_revealed.*")
+    return os.path.normcase(output)
+
+
+def build_conceal_jobs(args):
+    """Pair payloads with covers from a manifest or from two directories"""
+    if args.manifest:
+        rows = _read_manifest(args.manifest, ['payload', 'cover'])
+    else:
+        payloads = _list_files(args.payloads)
+        covers = _list_files(args.covers, IMAGE_EXTENSIONS)
+        if len(payloads) != len(covers):
+            print(f"⚠️ {len(payloads)} payloads and {len(covers)} covers, "
+                  f"only the first {min(len(payloads), len(covers))} pairs will be processed",
+                  file=sys.stderr)
+        rows = [{'payload': payload, 'cover': cover} for payload, cover in zip(payloads, covers)]
+
+    jobs = []
+    for row in rows:
+        output = row.get('output')
+        if not output:
+            # Name outputs after the payload too, since a manifest may reuse one cover for many payloads
+            base_name = os.path.splitext(os.path.basename(row['cover']))[0]
+            payload_name = os.path.splitext(os.path.basename(row['payload']))[0]
+            output = os.path.join(args.output, f"{base_name}_{payload_name}_concealed{output_extension(args.format)}")
+        jobs.append({'payload': row['payload'], 'cover': row['cover'], 'output': output,
+                     'key': args.key, 'bits_per_channel': args.bits, 'salt': args.salt, 'kdf': args.kdf_params,
+                     'compression': COMPRESSION_NAMES[args.compression], 'output_format': args.format})
+    _check_outputs(jobs, 'payload', _conceal_target)
+    return jobs
+
+
+def build_reveal_jobs(args):
+    """List the images to reveal from a manifest or a directory"""
+    if args.manifest:
+        rows = _read_manifest(args.manifest, ['image'])
+    else:
+        rows = [{'image': image} for image in _list_files(args.images, IMAGE_EXTENSIONS)]
+
+    jobs = [{'image': row['image'], 'output': row.get('output') or args.output, 'key': args.key,
+             'legacy': args.legacy, 'max_kdf_cost': args.max_kdf_cost} for row in rows]
+    _check_outputs(jobs, 'image', _reveal_target)
+    return jobs
+
+
+def conceal_item(job):
+    """Conceal one payload/cover pair and return its result record"""
+    record = {'payload': job['payload'], 'cover': job['cover'], 'output': job['output']}
+    start = time.perf_counter()
+    try:
+        image = conceal_image(job['payload'], job['cover'], job['key'], job['bits_per_channel'], workers=1,
+                              key_cache=_key_cache, salt=job['salt'], compression=job['compression'], kdf=job['kdf'])
+        save_image(image, job['output'], job['output_format'])
+        record.update(ok=True, bytes=os.path.getsize(job['payload']))
+    except ConcealerError as e:
+        record.update(ok=False, error=str(e))
+    except Exception as e:
+        record.update(ok=False, error=f"Error concealing file: {str(e)}")
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def reveal_item(job):
+    """Reveal the payload of one image and return its result record"""
+    record = {'image': job['image']}
+    start = time.perf_counter()
+    try:
+        # An output directory gets the same file name the window would use
+        output_path = reveal_to_file(job['image'], job['output'], job['key'], workers=1, key_cache=_key_cache,
+                                     legacy=job['legacy'], max_kdf_cost=job['max_kdf_cost'])
+        record.update(ok=True, output=output_path, bytes=os.path.getsize(output_path))
+    except ConcealerError as e:
+        record.update(ok=False, error=str(e))
+    except Exception as e:
+        record.update(ok=False, error=f"Error revealing file: {str(e)}")
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run_batch(worker, jobs, processes, results_path, seed=None):
+    """Run worker over jobs on a process pool, logging one JSON record per item"""
+    start = time.perf_counter()
+    succeeded = failed = total_bytes = 0
+
+    with open(results_path, 'w', encoding='utf-8') as results, \
+            ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(seed,)) as pool:
+        futures = [pool.submit(worker, job) for job in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            results.write(json.dumps(record) + '\n')
+            if record['ok']:
+                succeeded += 1
+                total_bytes += record['bytes']
+            else:
+                failed += 1
+                print(f"❌ {record.get('image') or record.get('payload')}: {record['error']}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    megabytes = total_bytes / (1024 * 1024)
+    summary = {
+        'items': len(jobs),
+        'succeeded': succeeded,
+        'failed': failed,
+        'megabytes': round(megabytes, 3),
+        'seconds': round(elapsed, 3),
+        'items_per_second': round(len(jobs) / elapsed, 2) if elapsed else 0.0,
+        'mb_per_second': round(megabytes / elapsed, 2) if elapsed else 0.0,
+    }
+    return summary
+
+
+def split_file(args):
+    """Conceal one payload across the covers in a directory and return the summary"""
+    covers = _list_files(args.covers, IMAGE_EXTENSIONS)
+    extension = output_extension(args.format)
+    outputs = [os.path.join(args.output, f"{os.path.splitext(os.path.basename(cover))[0]}_concealed{extension}")
+               for cover in covers]
+    if len(set(map(os.path.normcase, outputs))) != len(outputs):
+        raise ConcealerError("The covers must have different file names!")
+    start = time.perf_counter()
+    used = conceal_split(args.payload, covers, outputs, args.key, args.bits, max(1, args.threads),
+                         compression=COMPRESSION_NAMES[args.compression], output_format=args.format,
+                         kdf=args.kdf_params)
+    elapsed = time.perf_counter() - start
+    megabytes = os.path.getsize(args.payload) / (1024 * 1024)
+    return {'images': used, 'megabytes': round(megabytes, 3), 'seconds': round(elapsed, 3),
+            'mb_per_second': round(megabytes / elapsed, 2) if elapsed else 0.0}
+
+
+def join_files(args):
+    """Reveal the payload split across the images in a directory and return the summary"""
+    images = _list_files(args.images, IMAGE_EXTENSIONS)
+    start = time.perf_counter()
+    output_path = reveal_split_to_file(images, args.output, args.key, max(1, args.threads),
+                                       max_kdf_cost=args.max_kdf_cost)
+    elapsed = time.perf_counter() - start
+
+    megabytes = os.path.getsize(output_path) / (1024 * 1024)
+    return {'output': output_path, 'megabytes': round(megabytes, 3), 'seconds': round(elapsed, 3),
+            'mb_per_second': round(megabytes / elapsed, 2) if elapsed else 0.0}
+
+
+def _walk_images(root):
+    """Return the sorted image files anywhere below root"""
+    paths = []
+    for directory, _, names in os.walk(root):
+        paths.extend(os.path.join(directory, name) for name in names if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+
+def _read_index(path):
+    """Load a scan index as a dict of records by path, or an empty one if it doesn't exist yet"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {record['path']: record for record in records}
+
+
+def scan_item(entry):
+    """Read only the container header of one image and return its index record"""
+    path, size, mtime = entry
+    record = {'path': path, 'size': size, 'mtime': mtime, 'payload_length': None, 'encrypted': False}
+    try:
+        header = read_image_header(path)
+        if header is not None:
+            record.update(payload_length=header.payload_length, encrypted=header.encrypted)
+    except ConcealerError as e:
+        record['error'] = str(e)
+    except Exception as e:
+        record['error'] = f"Error reading image: {str(e)}"
+    return record
+
+
+def scan_images(args):
+    """Index which images below a directory hold hidden data, rescanning only new or changed files"""
+    start = time.perf_counter()
+    previous = _read_index(args.index)
+    records, pending = [], []
+    for path in _walk_images(args.images):
+        stat = os.stat(path)
+        record = previous.get(path)
+        if record is not None and record['size'] == stat.st_size and record['mtime'] == stat.st_mtime:
+            records.append(record)
+        else:
+            pending.append((path, stat.st_size, stat.st_mtime))
+
+    if pending:
+        processes = max(1, args.jobs)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunk_size = max(1, min(64, len(pending) // (processes * 4)))
+            records.extend(pool.map(scan_item, pending, chunksize=chunk_size))
+    records.sort(key=lambda record: record['path'])
+
+    # Replace the index in one step so an interrupted scan keeps the previous one
+    temp_path = args.index + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    os.replace(temp_path, args.index)
+
+    elapsed = time.perf_counter() - start
+    return records, {
+        'images': len(records),
+        'scanned': len(pending),
+        'unchanged': len(records) - len(pending),
+        'with_payload': sum(record['payload_length'] is not None for record in records),
+        'errors': sum('error' in record for record in records),
+        'seconds': round(elapsed, 3),
+        'images_per_second': round(len(pending) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def kdf_params(args):
+    """Build the KdfParams chosen by the --kdf options"""
+    kdf = KDF_NAMES[args.kdf]
+    cost = args.kdf_cost or (SCRYPT_COST if kdf == KDF_SCRYPT else PBKDF2_ITERATIONS)
+    params = KdfParams(kdf, cost, salt_size=args.salt_size)
+    params.validate()
+    return params
+
+
+def build_parser():
+    keys = argparse.ArgumentParser(add_help=False)
+    keys.add_argument('--key', default=None, help="Encryption password")
+    keys.add_argument('--key-env', metavar='VAR',
+                      help="Read the encryption password from this environment variable")
+
+    common = argparse.ArgumentParser(add_help=False, parents=[keys])
+    common.add_argument('--jobs', type=int, default=DEFAULT_WORKERS,
+                        help="Number of worker processes (default: one per CPU)")
+    common.add_argument('--results', help="Per-item JSON lines log (default: OUTPUT/results.jsonl)")
+
+    threads = argparse.ArgumentParser(add_help=False, parents=[keys])
+    threads.add_argument('--threads', type=int, default=DEFAULT_WORKERS,
+                         help="Threads for decoding, embedding and encoding (default: one per CPU)")
+
+    kdf = argparse.ArgumentParser(add_help=False)
+    kdf.add_argument('--kdf', default='pbkdf2', choices=sorted(KDF_NAMES),
+                     help="Key derivation function recorded in the image (default: pbkdf2)")
+    kdf.add_argument('--kdf-cost', type=int,
+                     help=f"PBKDF2 iterations or scrypt cost N (default: {PBKDF2_ITERATIONS} or {SCRYPT_COST}); "
+                          f"see the calibrate command")
+    kdf.add_argument('--salt-size', type=int, default=SALT_SIZE, help=f"Salt bytes (default: {SALT_SIZE})")
+
+    max_kdf = argparse.ArgumentParser(add_help=False)
+    max_kdf.add_argument('--max-kdf-cost', type=int,
+                         help="Refuse images whose key derivation takes more than this many PBKDF2 iterations "
+                              "or scrypt N*r*p")
+
+    parser = argparse.ArgumentParser(description="Batch conceal/reveal files in images without the GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    conceal_parser = subparsers.add_parser('conceal', parents=[common, kdf],
+                                           help="Hide payload files in cover images")
+    source = conceal_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help="CSV with 'payload' and 'cover' columns (optional 'output')")
+    source.add_argument('--payloads', help="Directory of payload files, paired with covers in sorted order")
+    conceal_parser.add_argument('--covers', help="Directory of cover images (with --payloads)")
+    conceal_parser.add_argument('--bits', type=int, default=1, choices=range(1, 5),
+                                help="Payload bits per color channel")
+    conceal_parser.add_argument('--compression', default='none', choices=sorted(COMPRESSION_NAMES),
+                                help="Compress payloads before encryption (skipped for compressed files)")
+    conceal_parser.add_argument('--format', default=DEFAULT_OUTPUT_FORMAT, choices=list(OUTPUT_FORMATS),
+                                help="Lossless output encoder (default: png-fast)")
+    conceal_parser.add_argument('--shared-salt', action='store_true',
+                                help="Use one salt for the whole batch so the key is derived only once")
+    conceal_parser.add_argument('--output', required=True, help="Directory for concealed images")
+
+    reveal_parser = subparsers.add_parser('reveal', parents=[common, max_kdf],
+                                          help="Extract hidden files from images")
+    source = reveal_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help="CSV with an 'image' column (optional 'output')")
+    source.add_argument('--images', help="Directory of concealed images")
+    reveal_parser.add_argument('--key-file',
+                               help="File of candidate passwords, one per line, tried in order after --key")
+    reveal_parser.add_argument('--output', required=True, help="Directory for revealed files")
+    reveal_parser.add_argument('--legacy', action='store_true',
+                               help="Also read unencrypted images from the first version, which only end with a "
+                                    "marker; any image that happens to contain one reveals a file")
+
+    split_parser = subparsers.add_parser('split', parents=[threads, kdf],
+                                         help="Hide one large file across several cover images")
+    split_parser.add_argument('--payload', required=True, help="File to hide")
+    split_parser.add_argument('--covers', required=True,
+                              help="Directory of cover images, filled in sorted order until the file fits")
+    split_parser.add_argument('--bits', type=int, default=1, choices=range(1, 5),
+                              help="Payload bits per color channel")
+    split_parser.add_argument('--compression', default='none', choices=sorted(COMPRESSION_NAMES),
+                              help="Compress the file before encryption (skipped for compressed files)")
+    split_parser.add_argument('--format', default=DEFAULT_OUTPUT_FORMAT, choices=list(OUTPUT_FORMATS),
+                              help="Lossless output encoder (default: png-fast)")
+    split_parser.add_argument('--output', required=True, help="Directory for concealed images")
+
+    join_parser = subparsers.add_parser('join', parents=[threads, max_kdf],
+                                        help="Reveal a file split across several images")
+    join_parser.add_argument('--images', required=True,
+                             help="Directory holding every image of one set, in any order")
+    join_parser.add_argument('--key-file',
+                             help="File of candidate passwords, one per line, tried in order after --key")
+    join_parser.add_argument('--output', required=True, help="Directory or file name for the revealed file")
+
+    calibrate_parser = subparsers.add_parser('calibrate',
+                                             help="Pick KDF settings that take a target time on this machine")
+    calibrate_parser.add_argument('--target-ms', type=float, default=250.0,
+                                  help="Time one key derivation should take (default: 250)")
+    calibrate_parser.add_argument('--kdf', default='pbkdf2', choices=sorted(KDF_NAMES),
+                                  help="Key derivation function to calibrate (default: pbkdf2)")
+    calibrate_parser.add_argument('--salt-size', type=int, default=SALT_SIZE,
+                                  help=f"Salt bytes (default: {SALT_SIZE})")
+
+    scan_parser = subparsers.add_parser('scan', help="Index which images in a directory tree hold hidden data")
+    scan_parser.add_argument('--images', required=True, help="Directory searched recursively for images")
+    scan_parser.add_argument('--index', required=True,
+                             help="JSON lines index to write; files unchanged since the last scan are skipped")
+    scan_parser.add_argument('--jobs', type=int, default=DEFAULT_WORKERS,
+                             help="Number of worker processes (default: one per CPU)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'scan':
+        records, summary = scan_images(args)
+        for record in records:
+            if record['payload_length'] is not None:
+                print(f"🔒 {record['path']}: {record['payload_length']} bytes"
+                      f"{' (encrypted)' if record['encrypted'] else ''}")
+        print(f"✅ scan: {summary['with_payload']} of {summary['images']} images hold hidden data, "
+              f"{summary['scanned']} scanned and {summary['unchanged']} unchanged in {summary['seconds']:.2f}s")
+        print(f"Index: {args.index}")
+        print(json.dumps(summary))
+        return 0
+    if args.command == 'calibrate':
+        if args.target_ms <= 0:
+            parser.error("--target-ms must be positive")
+        try:
+            params, milliseconds = calibrate_kdf(args.target_ms, KDF_NAMES[args.kdf], args.salt_size)
+        except ConcealerError as e:
+            print(f"❌ calibrate: {str(e)}", file=sys.stderr)
+            return 1
+        print(f"⏱️ {params.describe()}: {milliseconds:.0f} ms per key (target {args.target_ms:.0f} ms)")
+        print(f"Use: --kdf {args.kdf} --kdf-cost {params.cost} --salt-size {params.salt_size}")
+        print(json.dumps({'kdf': args.kdf, 'cost': params.cost, 'block_size': params.block_size,
+                          'parallelism': params.parallelism, 'salt_size': params.salt_size,
+                          'milliseconds': round(milliseconds, 1)}))
+        return 0
+    if args.key_env:
+        args.key = os.environ.get(args.key_env)
+    if getattr(args, 'key_file', None):
+        # Wrong candidates are rejected by the header's key check, right after their KDF
+        with open(args.key_file, encoding='utf-8') as f:
+            candidates = [line.rstrip('\r\n') for line in f if line.rstrip('\r\n')]
+        args.key = ([args.key] if args.key else []) + candidates
+    if args.command == 'conceal' and args.payloads and not args.covers:
+        parser.error("--covers is required with --payloads")
+    if args.command in ('conceal', 'split'):
+        try:
+            args.kdf_params = kdf_params(args)
+        except ConcealerError as e:
+            parser.error(str(e))
+
+    if args.command in ('split', 'join'):
+        if args.command == 'split':
+            os.makedirs(args.output, exist_ok=True)
+        try:
+            summary = split_file(args) if args.command == 'split' else join_files(args)
+        except ConcealerError as e:
+            print(f"❌ {args.command}: {str(e)}", file=sys.stderr)
+            return 1
+        print(f"✅ {args.command}: {summary['megabytes']:.2f} MB in {summary['seconds']:.2f}s "
+              f"({summary['mb_per_second']:.2f} MB/s)")
+        print(json.dumps(summary))
+        return 0
+
+    os.makedirs(args.output, exist_ok=True)
+    seed = None
+    args.salt = None
+    if args.command == 'conceal' and args.key and args.shared_salt:
+        # Derive the batch key once here and hand it to every worker
+        args.salt = os.urandom(args.kdf_params.salt_size)
+        with KeyCache() as cache:
+            seed = (args.key, args.salt, args.kdf_params, cache.derive(args.key, args.salt, args.kdf_params))
+
+    if args.command == 'conceal':
+        worker, jobs = conceal_item, build_conceal_jobs(args)
+    else:
+        worker, jobs = reveal_item, build_reveal_jobs(args)
+
+    results_path = args.results or os.path.join(args.output, 'results.jsonl')
+    summary = run_batch(worker, jobs, max(1, args.jobs), results_path, seed)
+
+    print(f"{'✅' if not summary['failed'] else '⚠️'} {args.command}: "
+          f"{summary['succeeded']}/{summary['items']} succeeded in {summary['seconds']:.2f}s "
+          f"({summary['items_per_second']:.2f} items/s, {summary['mb_per_second']:.2f} MB/s)")
+    print(f"Results: {results_path}")
+    print(json.dumps(summary))
+    return 0 if not summary['failed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import sys
+import os
+import json
+import socket
+import argparse
+import tempfile
+
+
+# Keep in step with concealer_service.py; this module only uses the standard library so it starts quickly
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'file_concealer.sock')
+DEFAULT_PORT = 8765
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.file_concealer_token')
+STREAM_CHUNK_SIZE = 1 << 20
+
+
+class ServiceError(Exception):
+    """Raised when the service rejects a request, with its message for the user"""
+
+
+class ServiceClient:
+    """Sends conceal and reveal requests to a running concealer_service
+
+    Paths are made absolute before they are sent, since the service may run
+    in another directory. Results the service streams back are returned as
+    bytes, or written to a local file when output_file is given. Over TCP,
+    each request carries the token the service wrote to token_file.
+    """
+
+    def __init__(self, socket_path=None, port=None, timeout=None, token_file=None):
+        if socket_path is None and port is None:
+            if hasattr(socket, 'AF_UNIX') and os.name != 'nt':
+                socket_path = DEFAULT_SOCKET
+            else:
+                port = DEFAULT_PORT
+        self.socket_path = socket_path
+        self.port = port
+        self.timeout = timeout
+        self.token_file = token_file or DEFAULT_TOKEN_FILE
+
+    def _read_token(self):
+        """Read the service's token, fresh for every request since a restarted service writes a new one"""
+        try:
+            with open(self.token_file, encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError as e:
+            raise ServiceError(f"Cannot read the service token: {str(e)}")
+
+    def _connect(self):
+        if self.port is not None:
+            return socket.create_connection(('127.0.0.1', self.port), timeout=self.timeout)
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(self.socket_path)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def request(self, request, progress=None, output_file=None):
+        """Send one request and return the service's final record
+
+        progress, if given, is called as progress(event) for every progress
+        event. A streamed result is written to output_file (a path or a
+        binary file-like object) or returned as the record's 'data'.
+        """
+        if self.port is not None:
+            request = dict(request, token=self._read_token())
+        try:
+            connection = self._connect()
+        except OSError as e:
+            raise ServiceError(f"Cannot reach the concealer service: {str(e)}")
+        with connection, connection.makefile('rb') as stream:
+            connection.sendall(json.dumps(request).encode() + b'\n')
+            received = None
+            while True:
+                line = stream.readline()
+                if not line:
+                    raise ServiceError("The service closed the connection without a result!")
+                event = json.loads(line)
+                kind = event.get('event')
+                if kind == 'progress':
+                    if progress is not None:
+                        progress(event)
+                elif kind == 'file':
+                    received = self._receive(stream, event, output_file)
+                elif kind == 'error':
+                    raise ServiceError(event['error'])
+                elif kind == 'done':
+                    if received is not None:
+                        event.update(received)
+                    return event
+
+    def _receive(self, stream, event, output_file):
+        """Read the bytes that follow a 'file' event"""
+        remaining = event['size']
+        if output_file is None:
+            data = stream.read(remaining)
+            if len(data) != remaining:
+                raise ServiceError("The service closed the connection mid-file!")
+            return {'name': event['name'], 'data': data}
+
+        owned = isinstance(output_file, (str, os.PathLike))
+        f = open(output_file, 'wb') if owned else output_file
+        try:
+            while remaining:
+                data = stream.read(min(remaining, STREAM_CHUNK_SIZE))
+                if not data:
+                    raise ServiceError("The service closed the connection mid-file!")
+                f.write(data)
+                remaining -= len(data)
+        finally:
+            if owned:
+                f.close()
+        return {'name': event['name'], 'output': os.fspath(output_file) if owned else None}
+
+    def ping(self):
+        """Return the service's status record: worker count, requests served and uptime"""
+        return self.request({'op': 'ping'})
+
+    def conceal(self, payload, cover, output=None, key=None, bits=1, compression='none', output_format=None,
+                kdf=None, kdf_cost=None, progress=None, output_file=None):
+        """Hide the payload file in cover, or split it across a list of covers
+
+        With output, the service writes the image (or, for a list of covers,
+        the images in that directory) and returns the record. Otherwise the
+        image is streamed back, as the record's 'data' or into output_file.
+        """
+        request = {'op': 'conceal', 'payload': os.path.abspath(payload), 'key': key, 'bits': bits,
+                   'compression': compression}
+        if isinstance(cover, (list, tuple)):
+            request['covers'] = [os.path.abspath(path) for path in cover]
+        else:
+            request['cover'] = os.path.abspath(cover)
+        if output:
+            request['output'] = os.path.abspath(output)
+        if output_format:
+            request['format'] = output_format
+        if kdf:
+            request['kdf'] = kdf
+        if kdf_cost:
+            request['kdf_cost'] = kdf_cost
+        return self.request(request, progress, output_file)
+
+    def reveal(self, image, output=None, key=None, progress=None, output_file=None, legacy=False):
+        """Reveal the file hidden in image, or in a list of images made by a split
+
+        key may be one password or a list of candidates. legacy also reads an
+        unencrypted image from the first version. With output (a file
+        or a directory), the service writes the file and returns the record.
+        Otherwise it is streamed back, as the record's 'data' or into
+        output_file.
+        """
+        request = {'op': 'reveal', 'key': key}
+        if isinstance(image, (list, tuple)):
+            request['images'] = [os.path.abspath(path) for path in image]
+        else:
+            request['image'] = os.path.abspath(image)
+        if output:
+            request['output'] = os.path.abspath(output)
+        if legacy:
+            request['legacy'] = True
+        return self.request(request, progress, output_file)
+
+
+def _print_progress(event):
+    if event.get('message'):
+        print(f"[{event['percent']:3d}%] {event['message']}", file=sys.stderr)
+
+
+def build_parser():
+    connection = argparse.ArgumentParser(add_help=False)
+    where = connection.add_mutually_exclusive_group()
+    where.add_argument('--socket', help=f"Unix socket of the service (default: {DEFAULT_SOCKET})")
+    where.add_argument('--port', type=int, help="Localhost TCP port of the service instead of a Unix socket")
+    connection.add_argument('--token-file',
+                            help=f"Token file written by a service on --port (default: {DEFAULT_TOKEN_FILE})")
+    connection.add_argument('--key', default=None, help="Encryption password")
+    connection.add_argument('--key-env', metavar='VAR',
+                            help="Read the encryption password from this environment variable")
+    connection.add_argument('--quiet', action='store_true', help="Don't print progress messages")
+
+    parser = argparse.ArgumentParser(description="Send conceal/reveal requests to a running concealer_service")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('ping', parents=[connection], help="Check that the service is running")
+
+    conceal_parser = subparsers.add_parser('conceal', parents=[connection], help="Hide a file in an image")
+    conceal_parser.add_argument('--payload', required=True, help="File to hide")
+    conceal_parser.add_argument('--cover', required=True, nargs='+',
+                                help="Cover image; several covers split the file across them")
+    conceal_parser.add_argument('--bits', type=int, default=1, choices=range(1, 5),
+                                help="Payload bits per color channel")
+    conceal_parser.add_argument('--compression', default='none', help="none, zlib, lzma or bz2")
+    conceal_parser.add_argument('--format', help="Lossless output encoder (default: png-fast)")
+    conceal_parser.add_argument('--kdf', help="Key derivation function: pbkdf2 or scrypt")
+    conceal_parser.add_argument('--kdf-cost', type=int, help="PBKDF2 iterations or scrypt cost N")
+    conceal_parser.add_argument('--output', required=True,
+                                help="Concealed image (a directory when splitting across several covers)")
+
+    reveal_parser = subparsers.add_parser('reveal', parents=[connection], help="Extract a hidden file")
+    reveal_parser.add_argument('--image', required=True, nargs='+',
+                               help="Concealed image, or every image of a split set")
+    reveal_parser.add_argument('--output', required=True, help="Directory or file name for the revealed file")
+    reveal_parser.add_argument('--legacy', action='store_true',
+                               help="Also read an unencrypted image from the first version")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.key_env:
+        args.key = os.environ.get(args.key_env)
+    client = ServiceClient(args.socket, args.port, token_file=args.token_file)
+    progress = None if args.quiet else _print_progress
+
+    try:
+        if args.command == 'ping':
+            record = client.ping()
+            print(f"✅ Service is up with {record['workers']} worker(s), "
+                  f"{record['served']} request(s) served in {record['uptime']:.0f}s")
+        elif args.command == 'conceal':
+            cover = args.cover if len(args.cover) > 1 else args.cover[0]
+            record = client.conceal(args.payload, cover, args.output, args.key, args.bits, args.compression,
+                                    args.format, args.kdf, args.kdf_cost, progress)
+            print(f"✅ conceal: {', '.join(record.get('outputs') or [record['output']])}")
+        else:
+            image = args.image if len(args.image) > 1 else args.image[0]
+            record = client.reveal(image, args.output, args.key, progress, legacy=args.legacy)
+            print(f"✅ reveal: {record['output']} ({record['bytes']} bytes)")
+    except ServiceError as e:
+        print(f"❌ {args.command}: {str(e)}", file=sys.stderr)
+        return 1
+    print(json.dumps(record))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
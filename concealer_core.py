@@ -0,0 +1,1915 @@
+import os
+import io
+import base64
+import bz2
+import copy
+import lzma
+import math
+import hmac
+import hashlib
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from PIL import Image, ImageFile
+import numpy as np
+
+
+# Container header written in front of every concealed payload
+HEADER_MAGIC = b'FCON'
+HEADER_VERSION = 8
+MAX_HEADER_SIZE = 1024
+
+# Header flags
+FLAG_ENCRYPTED = 0x01
+
+# Key derivation functions; the header records the function, its cost and the salt
+KDF_NONE = 0
+KDF_PBKDF2_SHA256 = 1
+KDF_SCRYPT = 2
+KDF_NAMES = {'pbkdf2': KDF_PBKDF2_SHA256, 'scrypt': KDF_SCRYPT}
+PBKDF2_ITERATIONS = 100000
+MIN_PBKDF2_ITERATIONS = 1000
+# Headers asking for more PBKDF2 iterations than this, a few seconds of work, are rejected
+MAX_PBKDF2_ITERATIONS = 10000000
+SCRYPT_COST = 1 << 15
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELISM = 1
+MIN_SCRYPT_COST = 1 << 10
+# Headers asking scrypt for more memory, or more work N*r*p, than this are rejected
+MAX_KDF_MEMORY = 1 << 30
+MAX_SCRYPT_WORK = 1 << 24
+SALT_SIZE = 16
+MIN_SALT_SIZE = 8
+MAX_SALT_SIZE = 64
+# PBKDF2 calibration times this many iterations and scales the result
+CALIBRATION_ITERATIONS = 20000
+
+# Encrypted payloads carry a short tag of the derived key so a wrong key fails before extraction
+KEY_CHECK_SIZE = 8
+KEY_CHECK_LABEL = b'FCON key check'
+
+# Every stored payload (each shard of a split file) carries a BLAKE2b digest checked as it is extracted
+PAYLOAD_DIGEST_SIZE = 16
+
+# Payload ciphers; headers before version 3 imply Fernet when the encrypted flag is set
+CIPHER_NONE = 0
+CIPHER_FERNET = 1
+CIPHER_AES_GCM_STREAM = 2
+DEFAULT_SEGMENT_SIZE = 1 << 20
+MAX_SEGMENT_SIZE = 1 << 26
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+
+# Images made before the container header end their payload with a 16-bit marker
+# ('1111111111111110'); encrypted ones hold a salt and a Fernet token keyed with PBKDF2
+LEGACY_MARKER = b'\xff\xfe'
+LEGACY_SALT_SIZE = 16
+LEGACY_TOKEN_PREFIX = b'gAAAAA'
+LEGACY_SEARCH_CHANNELS = 1 << 20
+
+# Payloads spanning several covers share a random set ID; single images form a set of one
+SET_ID_SIZE = 16
+MAX_SHARDS = 0xFFFF
+
+# Compression applied before encryption
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSION_BZ2 = 3
+COMPRESSION_NAMES = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB,
+                     'lzma': COMPRESSION_LZMA, 'bz2': COMPRESSION_BZ2}
+
+# Payloads are sampled to skip compression when it would not pay off
+COMPRESSION_SAMPLE_SIZE = 1 << 16
+COMPRESSIBLE_RATIO = 0.9
+COMPRESSED_SIGNATURES = (
+    b'PK\x03\x04',          # ZIP, DOCX, XLSX, JAR
+    b'\x1f\x8b',            # gzip
+    b'\x89PNG',             # PNG
+    b'\xff\xd8\xff',        # JPEG
+    b'GIF8',                # GIF
+    b'BZh',                 # bzip2
+    b'\xfd7zXZ\x00',        # xz
+    b"7z\xbc\xaf'\x1c",     # 7-Zip
+    b'Rar!',                # RAR
+    b'\x28\xb5\x2f\xfd',    # Zstandard
+    b'OggS',                # Ogg
+    b'fLaC',                # FLAC
+    b'ID3',                 # MP3
+)
+
+# Payload bits stored per color channel (the header always uses one)
+MIN_BITS_PER_CHANNEL = 1
+MAX_BITS_PER_CHANNEL = 4
+
+# Parallel embed/extract splits the payload into row bands of at least this many channels
+DEFAULT_WORKERS = os.cpu_count() or 1
+MIN_BAND_CHANNELS = 1 << 20
+
+# Streamed payloads are embedded in batches of this many bytes
+STREAM_BUFFER_SIZE = 1 << 22
+
+# Decoded images are copied into the pixel array in bands of about this many bytes
+DECODE_BAND_SIZE = 1 << 22
+
+# Revealed files are named from the signature in their first bytes
+SIGNATURE_SIZE = 16
+
+# Payloads compressed before being split across covers are kept in memory up to this size, then on disk
+SPOOL_SIZE = 1 << 24
+
+# Compressors are fed this much at a time so a cancel is noticed quickly even with LZMA
+COMPRESS_CHUNK_SIZE = 1 << 16
+
+# Decompressors return at most this much at a time, however far the payload expands
+DECOMPRESS_CHUNK_SIZE = 1 << 20
+
+# Byte-level progress is reported at most once per this many seconds
+PROGRESS_INTERVAL = 0.1
+
+# Decoders whose tiles can stop after the first rows, for header-only reads
+_ROW_LIMITED_DECODERS = ('zip', 'raw')
+
+# Lossless output encoders: name -> (Pillow format, save options, file extension)
+OUTPUT_FORMATS = {
+    'png-fast': ('PNG', {'compress_level': 1}, '.png'),
+    'png': ('PNG', {'compress_level': 6}, '.png'),
+    'png-small': ('PNG', {'compress_level': 9, 'optimize': True}, '.png'),
+    'webp': ('WEBP', {'lossless': True, 'quality': 0, 'method': 0, 'exact': True}, '.webp'),
+    'tiff-lzw': ('TIFF', {'compression': 'tiff_lzw'}, '.tif'),
+    'tiff': ('TIFF', {}, '.tif'),
+    'bmp': ('BMP', {}, '.bmp'),
+}
+DEFAULT_OUTPUT_FORMAT = 'png-fast'
+WEBP_MAX_DIMENSION = 16383
+
+# magic, version, total header size (including the trailing CRC32)
+_PREAMBLE = struct.Struct('>4sBH')
+# flags, payload length, kdf, kdf iterations, salt length (the salt follows)
+_FIELDS_V1 = struct.Struct('>BQBIB')
+# bits per channel
+_FIELDS_V2 = struct.Struct('>B')
+# cipher, segment size, nonce prefix
+_FIELDS_V3 = struct.Struct(f'>BI{NONCE_PREFIX_SIZE}s')
+# compression
+_FIELDS_V4 = struct.Struct('>B')
+# set ID, shard index, shard count
+_FIELDS_V5 = struct.Struct(f'>{SET_ID_SIZE}sHH')
+# key check
+_FIELDS_V6 = struct.Struct(f'>{KEY_CHECK_SIZE}s')
+# payload digest
+_FIELDS_V7 = struct.Struct(f'>{PAYLOAD_DIGEST_SIZE}s')
+# scrypt block size, scrypt parallelism (the cost N is stored as the KDF iterations)
+_FIELDS_V8 = struct.Struct('>BB')
+_CRC = struct.Struct('>I')
+
+
+class ConcealerError(Exception):
+    """Raised for expected conceal/reveal failures, with a message fit for the user"""
+
+
+class ConcealCancelled(ConcealerError):
+    """Raised when a conceal or reveal is stopped through its CancelToken"""
+
+
+class CancelToken:
+    """Lets another thread stop a running conceal or reveal between chunks"""
+    
+    def __init__(self):
+        self._event = threading.Event()
+    
+    def cancel(self):
+        """Ask the operation to stop at its next check"""
+        self._event.set()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+    
+    def check(self):
+        """Raise ConcealCancelled if cancel() has been called"""
+        if self._event.is_set():
+            raise ConcealCancelled("Operation cancelled!")
+
+
+class ContainerHeader:
+    """Fixed header describing the payload hidden in an image"""
+    
+    def __init__(self, payload_length, flags=0, kdf=KDF_NONE, kdf_iterations=0, salt=b'',
+                 bits_per_channel=1, version=HEADER_VERSION, cipher=None, segment_size=0,
+                 nonce_prefix=bytes(NONCE_PREFIX_SIZE), compression=COMPRESSION_NONE,
+                 set_id=bytes(SET_ID_SIZE), shard_index=0, shard_count=1, key_check=bytes(KEY_CHECK_SIZE),
+                 payload_digest=bytes(PAYLOAD_DIGEST_SIZE), kdf_block_size=0, kdf_parallelism=0):
+        self.payload_length = payload_length
+        self.flags = flags
+        self.kdf = kdf
+        self.kdf_iterations = kdf_iterations
+        self.salt = salt
+        self.bits_per_channel = bits_per_channel
+        self.version = version
+        if cipher is None:
+            cipher = CIPHER_FERNET if flags & FLAG_ENCRYPTED else CIPHER_NONE
+        self.cipher = cipher
+        self.segment_size = segment_size
+        self.nonce_prefix = nonce_prefix
+        self.compression = compression
+        self.set_id = set_id
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.key_check = key_check
+        self.payload_digest = payload_digest
+        self.kdf_block_size = kdf_block_size
+        self.kdf_parallelism = kdf_parallelism
+    
+    @property
+    def encrypted(self):
+        return bool(self.flags & FLAG_ENCRYPTED)
+    
+    @property
+    def kdf_params(self):
+        """The KdfParams the payload key was derived with"""
+        return KdfParams(self.kdf, self.kdf_iterations, self.kdf_block_size, self.kdf_parallelism, len(self.salt))
+    
+    @property
+    def size(self):
+        """Total number of bytes the packed header occupies"""
+        size = _PREAMBLE.size + _FIELDS_V1.size + len(self.salt) + _CRC.size
+        if self.version >= 2:
+            size += _FIELDS_V2.size
+        if self.version >= 3:
+            size += _FIELDS_V3.size
+        if self.version >= 4:
+            size += _FIELDS_V4.size
+        if self.version >= 5:
+            size += _FIELDS_V5.size
+        if self.version >= 6:
+            size += _FIELDS_V6.size
+        if self.version >= 7:
+            size += _FIELDS_V7.size
+        if self.version >= 8:
+            size += _FIELDS_V8.size
+        return size
+    
+    @property
+    def payload_offset(self):
+        """Index of the first color channel holding payload bits"""
+        return self.size * 8
+    
+    @property
+    def payload_channels(self):
+        """Number of color channels the payload occupies"""
+        return -(-self.payload_length * 8 // self.bits_per_channel)
+    
+    def pack(self):
+        """Serialize the header to bytes"""
+        data = _PREAMBLE.pack(HEADER_MAGIC, self.version, self.size)
+        data += _FIELDS_V1.pack(self.flags, self.payload_length, self.kdf,
+                                self.kdf_iterations, len(self.salt))
+        data += self.salt
+        if self.version >= 2:
+            data += _FIELDS_V2.pack(self.bits_per_channel)
+        if self.version >= 3:
+            data += _FIELDS_V3.pack(self.cipher, self.segment_size, self.nonce_prefix)
+        if self.version >= 4:
+            data += _FIELDS_V4.pack(self.compression)
+        if self.version >= 5:
+            data += _FIELDS_V5.pack(self.set_id, self.shard_index, self.shard_count)
+        if self.version >= 6:
+            data += _FIELDS_V6.pack(self.key_check)
+        if self.version >= 7:
+            data += _FIELDS_V7.pack(self.payload_digest)
+        if self.version >= 8:
+            data += _FIELDS_V8.pack(self.kdf_block_size, self.kdf_parallelism)
+        return data + _CRC.pack(zlib.crc32(data))
+    
+    @staticmethod
+    def peek_size(data):
+        """Return the total header size announced by a preamble, or None if it is not one"""
+        magic, version, size = _PREAMBLE.unpack_from(data)
+        if magic != HEADER_MAGIC:
+            return None
+        if version > HEADER_VERSION:
+            raise ConcealerError(f"Unsupported container version {version}!")
+        if not _PREAMBLE.size + _FIELDS_V1.size + _CRC.size <= size <= MAX_HEADER_SIZE:
+            raise ConcealerError("Corrupted container header!")
+        return size
+    
+    @classmethod
+    def unpack(cls, data):
+        """Parse a complete header, validating its checksum"""
+        size = cls.peek_size(data)
+        if size is None or len(data) < size:
+            raise ConcealerError("Corrupted container header!")
+        
+        body, (crc,) = data[:size - _CRC.size], _CRC.unpack_from(data, size - _CRC.size)
+        if zlib.crc32(body) != crc:
+            raise ConcealerError("Corrupted container header!")
+        
+        try:
+            version = body[len(HEADER_MAGIC)]
+            position = _PREAMBLE.size
+            flags, payload_length, kdf, kdf_iterations, salt_length = _FIELDS_V1.unpack_from(body, position)
+            position += _FIELDS_V1.size
+            salt = body[position:position + salt_length]
+            position += salt_length
+            
+            bits_per_channel = 1
+            if version >= 2:
+                (bits_per_channel,) = _FIELDS_V2.unpack_from(body, position)
+                position += _FIELDS_V2.size
+            
+            cipher, segment_size, nonce_prefix = None, 0, bytes(NONCE_PREFIX_SIZE)
+            if version >= 3:
+                cipher, segment_size, nonce_prefix = _FIELDS_V3.unpack_from(body, position)
+                position += _FIELDS_V3.size
+            
+            compression = COMPRESSION_NONE
+            if version >= 4:
+                (compression,) = _FIELDS_V4.unpack_from(body, position)
+                position += _FIELDS_V4.size
+            
+            set_id, shard_index, shard_count = bytes(SET_ID_SIZE), 0, 1
+            if version >= 5:
+                set_id, shard_index, shard_count = _FIELDS_V5.unpack_from(body, position)
+                position += _FIELDS_V5.size
+            
+            key_check = bytes(KEY_CHECK_SIZE)
+            if version >= 6:
+                (key_check,) = _FIELDS_V6.unpack_from(body, position)
+                position += _FIELDS_V6.size
+            
+            payload_digest = bytes(PAYLOAD_DIGEST_SIZE)
+            if version >= 7:
+                (payload_digest,) = _FIELDS_V7.unpack_from(body, position)
+                position += _FIELDS_V7.size
+            
+            kdf_block_size, kdf_parallelism = 0, 0
+            if version >= 8:
+                kdf_block_size, kdf_parallelism = _FIELDS_V8.unpack_from(body, position)
+        except struct.error:
+            raise ConcealerError("Corrupted container header!")
+        
+        header = cls(payload_length, flags, kdf, kdf_iterations, salt, bits_per_channel, version,
+                     cipher, segment_size, nonce_prefix, compression, set_id, shard_index, shard_count, key_check,
+                     payload_digest, kdf_block_size, kdf_parallelism)
+        if header.size != size or not MIN_BITS_PER_CHANNEL <= bits_per_channel <= MAX_BITS_PER_CHANNEL:
+            raise ConcealerError("Corrupted container header!")
+        if header.cipher == CIPHER_AES_GCM_STREAM and not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ConcealerError("Corrupted container header!")
+        if header.cipher not in (CIPHER_NONE, CIPHER_FERNET, CIPHER_AES_GCM_STREAM):
+            raise ConcealerError(f"Unsupported cipher {header.cipher}!")
+        if header.compression not in COMPRESSION_NAMES.values():
+            raise ConcealerError(f"Unsupported compression {header.compression}!")
+        if not header.shard_index < header.shard_count:
+            raise ConcealerError("Corrupted container header!")
+        if header.encrypted:
+            header.kdf_params.validate()
+        return header
+
+
+def payload_hash():
+    """Return a fresh hash object for the payload digest stored in the header"""
+    return hashlib.blake2b(digest_size=PAYLOAD_DIGEST_SIZE)
+
+
+class KdfParams:
+    """Key derivation settings: the function, its cost and the salt size
+    
+    cost is the iteration count for PBKDF2 and the power-of-two cost N for
+    scrypt. block_size and parallelism are scrypt's r and p, and are zero
+    for PBKDF2.
+    """
+    
+    def __init__(self, kdf=KDF_PBKDF2_SHA256, cost=PBKDF2_ITERATIONS, block_size=SCRYPT_BLOCK_SIZE,
+                 parallelism=SCRYPT_PARALLELISM, salt_size=SALT_SIZE):
+        if kdf != KDF_SCRYPT:
+            block_size, parallelism = 0, 0
+        self.kdf = kdf
+        self.cost = cost
+        self.block_size = block_size
+        self.parallelism = parallelism
+        self.salt_size = salt_size
+    
+    @property
+    def memory(self):
+        """Bytes of memory one derivation needs (scrypt only)"""
+        if self.kdf != KDF_SCRYPT:
+            return 0
+        return 128 * self.block_size * (self.cost + self.parallelism)
+    
+    @property
+    def work(self):
+        """How long one derivation takes, in PBKDF2 iterations or scrypt N*r*p, which cost about the same"""
+        if self.kdf == KDF_SCRYPT:
+            return self.cost * self.block_size * self.parallelism
+        return self.cost
+    
+    def validate(self, max_cost=None):
+        """Raise ConcealerError if these settings are unsupported or unreasonable
+        
+        max_cost, if given, is a lower ceiling on work set by the caller.
+        """
+        if self.kdf == KDF_PBKDF2_SHA256:
+            if not MIN_PBKDF2_ITERATIONS <= self.cost <= MAX_PBKDF2_ITERATIONS:
+                raise ConcealerError(f"PBKDF2 iterations must be between {MIN_PBKDF2_ITERATIONS} "
+                                     f"and {MAX_PBKDF2_ITERATIONS}!")
+        elif self.kdf == KDF_SCRYPT:
+            if self.cost < MIN_SCRYPT_COST or self.cost & (self.cost - 1):
+                raise ConcealerError(f"The scrypt cost must be a power of two of at least {MIN_SCRYPT_COST}!")
+            if not self.block_size or not self.parallelism or self.memory > MAX_KDF_MEMORY:
+                raise ConcealerError("Unsupported scrypt parameters!")
+            if self.work > MAX_SCRYPT_WORK:
+                raise ConcealerError(f"scrypt N*r*p must be at most {MAX_SCRYPT_WORK}!")
+        else:
+            raise ConcealerError(f"Unsupported key derivation function {self.kdf}!")
+        if not MIN_SALT_SIZE <= self.salt_size <= MAX_SALT_SIZE:
+            raise ConcealerError(f"The salt must be between {MIN_SALT_SIZE} and {MAX_SALT_SIZE} bytes!")
+        if max_cost is not None and self.work > max_cost:
+            raise ConcealerError(f"The key derivation ({self.describe()}) costs more than the allowed {max_cost}!")
+    
+    def pack(self):
+        """Bytes identifying these settings, for cache lookups"""
+        return struct.pack('>BIBB', self.kdf, self.cost, self.block_size, self.parallelism)
+    
+    def derive(self, password, salt):
+        """Run the KDF and return the raw 256-bit key"""
+        if self.kdf == KDF_SCRYPT:
+            kdf = Scrypt(salt=salt, length=32, n=self.cost, r=self.block_size, p=self.parallelism)
+        else:
+            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=self.cost)
+        if isinstance(password, str):
+            password = password.encode()
+        return kdf.derive(password)
+    
+    def describe(self):
+        if self.kdf == KDF_SCRYPT:
+            name = f"scrypt N={self.cost} r={self.block_size} p={self.parallelism}"
+        else:
+            name = f"PBKDF2-HMAC-SHA256 with {self.cost} iterations"
+        return f"{name}, {self.salt_size}-byte salt"
+
+
+DEFAULT_KDF = KdfParams()
+
+
+def _kdf_params(params):
+    """Accept KdfParams, a PBKDF2 iteration count, or None for the default"""
+    if params is None:
+        return DEFAULT_KDF
+    if isinstance(params, int):
+        return KdfParams(KDF_PBKDF2_SHA256, params)
+    return params
+
+
+def derive_key(password, salt, params=None, cache=None):
+    """Derive a Fernet key from a password, using cache if given
+    
+    params is a KdfParams, or a PBKDF2 iteration count; the default is
+    PBKDF2-HMAC-SHA256 with PBKDF2_ITERATIONS.
+    """
+    params = _kdf_params(params)
+    if cache is not None:
+        return cache.derive(password, salt, params)
+    return base64.urlsafe_b64encode(params.derive(password, salt))
+
+
+def _time_kdf(params):
+    start = time.perf_counter()
+    params.derive(b'calibration', bytes(params.salt_size))
+    return time.perf_counter() - start
+
+
+def calibrate_kdf(target_ms, kdf=KDF_PBKDF2_SHA256, salt_size=SALT_SIZE):
+    """Pick KDF settings that take about target_ms on this machine and return (params, measured ms)
+    
+    PBKDF2 time grows linearly with the iterations, so a short run is timed
+    and scaled. The scrypt cost must be a power of two, so it is doubled
+    while the next step still fits the target.
+    """
+    target = target_ms / 1000
+    if kdf == KDF_SCRYPT:
+        params = KdfParams(KDF_SCRYPT, MIN_SCRYPT_COST, salt_size=salt_size)
+        params.validate()
+        elapsed = _time_kdf(params)
+        while True:
+            larger = KdfParams(KDF_SCRYPT, params.cost * 2, salt_size=salt_size)
+            if elapsed * 2 > target or larger.memory > MAX_KDF_MEMORY or larger.work > MAX_SCRYPT_WORK:
+                break
+            params, elapsed = larger, _time_kdf(larger)
+    else:
+        probe = KdfParams(kdf, CALIBRATION_ITERATIONS, salt_size=salt_size)
+        probe.validate()
+        per_iteration = min(_time_kdf(probe) for _ in range(3)) / CALIBRATION_ITERATIONS
+        cost = int(target / per_iteration) // 1000 * 1000
+        params = KdfParams(kdf, min(MAX_PBKDF2_ITERATIONS, max(MIN_PBKDF2_ITERATIONS, cost)), salt_size=salt_size)
+    params.validate()
+    return params, _time_kdf(params) * 1000
+
+
+class KeyCache:
+    """Bounded LRU cache of derived keys for one batch session
+    
+    Entries are looked up by an HMAC of (password, salt, KDF settings) under a
+    random per-cache secret, so passwords are never stored. Evicted and
+    cleared keys are overwritten with zeros. Use it as a context manager to
+    wipe every key when the batch ends.
+    """
+    
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._secret = os.urandom(32)
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _entry_id(self, password, salt, params):
+        if isinstance(password, str):
+            password = password.encode()
+        message = _kdf_params(params).pack() + struct.pack('>H', len(salt)) + salt + password
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+    
+    def _store(self, entry_id, key):
+        self._keys[entry_id] = bytearray(key)
+        self._keys.move_to_end(entry_id)
+        while len(self._keys) > self.max_size:
+            _, evicted = self._keys.popitem(last=False)
+            evicted[:] = bytes(len(evicted))
+    
+    def seed(self, password, salt, params, key):
+        """Insert a key that was already derived elsewhere, e.g. in a parent process"""
+        with self._lock:
+            self._store(self._entry_id(password, salt, params), key)
+    
+    def derive(self, password, salt, params=None):
+        """Return the derived key, running the KDF only on a cache miss"""
+        entry_id = self._entry_id(password, salt, params)
+        with self._lock:
+            key = self._keys.get(entry_id)
+            if key is not None:
+                self._keys.move_to_end(entry_id)
+                return bytes(key)
+        
+        # Derive outside the lock so other threads are not blocked for the whole KDF
+        key = derive_key(password, salt, params)
+        with self._lock:
+            self._store(entry_id, key)
+        return key
+    
+    def clear(self):
+        """Wipe and drop every cached key"""
+        with self._lock:
+            for key in self._keys.values():
+                key[:] = bytes(len(key))
+            self._keys.clear()
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.clear()
+
+
+def stream_key(password, salt, params=None, cache=None):
+    """Return the raw 256-bit AEAD key derived from a password"""
+    return base64.urlsafe_b64decode(derive_key(password, salt, params, cache))
+
+
+def key_check(derived, nonce_prefix):
+    """Return the short tag stored in the header to recognize a derived key"""
+    raw = base64.urlsafe_b64decode(derived)
+    return hmac.new(raw, KEY_CHECK_LABEL + nonce_prefix, hashlib.sha256).digest()[:KEY_CHECK_SIZE]
+
+
+def _candidate_keys(keys):
+    """Return one password or a list of candidates as a non-empty list, or ask for a key"""
+    if isinstance(keys, (str, bytes)):
+        keys = [keys]
+    keys = [key for key in keys or () if key]
+    if not keys:
+        raise ConcealerError("The hidden file is encrypted. Please enter the decryption key!")
+    return keys
+
+
+def unlock_key(header, keys, key_cache=None, max_kdf_cost=None):
+    """Return the derived key that decrypts the payload described by header, or None if it is not encrypted
+    
+    keys may be one password or a list of candidate passwords. Headers from
+    version 6 on carry a key check, so each wrong candidate costs only its
+    KDF and is rejected before any payload is extracted. Older headers
+    cannot tell, so their single key is returned unchecked. A header whose
+    KDF work exceeds max_kdf_cost is rejected before any key is derived.
+    """
+    if not header.encrypted:
+        return None
+    header.kdf_params.validate(max_kdf_cost)
+    keys = _candidate_keys(keys)
+    if header.version < 6:
+        if len(keys) > 1:
+            raise ConcealerError("This image was concealed by an older version. Please enter a single key!")
+        return derive_key(keys[0], header.salt, header.kdf_params, key_cache)
+    
+    for key in keys:
+        derived = derive_key(key, header.salt, header.kdf_params, key_cache)
+        if hmac.compare_digest(key_check(derived, header.nonce_prefix), header.key_check):
+            return derived
+    raise ConcealerError("Incorrect key/password!")
+
+
+def encrypted_length(length, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Return the size of the AEAD stream for a plaintext of length bytes"""
+    segments = max(1, -(-length // segment_size))
+    return length + segments * TAG_SIZE
+
+
+def _segments(chunks, size):
+    """Regroup chunks into blocks of exactly size bytes, yielding (block, is_last)
+    
+    The final block may be shorter, and there is always at least one block so
+    an empty stream still carries an authentication tag.
+    """
+    previous = None
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        while len(pending) >= size:
+            block = bytes(pending[:size])
+            del pending[:size]
+            if previous is not None:
+                yield previous, False
+            previous = block
+    
+    if previous is not None and not pending:
+        yield previous, True
+        return
+    if previous is not None:
+        yield previous, False
+    yield bytes(pending), True
+
+
+def _segment_nonce(nonce_prefix, index, last):
+    """Build the nonce for one segment: stream prefix, segment counter and last-segment flag"""
+    return nonce_prefix + struct.pack('>IB', index, 1 if last else 0)
+
+
+def encrypt_stream(key, nonce_prefix, chunks, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Encrypt plaintext chunks into AES-GCM segments, yielding one ciphertext segment at a time"""
+    aead = AESGCM(key)
+    for index, (segment, last) in enumerate(_segments(chunks, segment_size)):
+        yield aead.encrypt(_segment_nonce(nonce_prefix, index, last), segment, None)
+
+
+def decrypt_stream(key, nonce_prefix, chunks, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Decrypt and authenticate AES-GCM segments, yielding one plaintext segment at a time"""
+    aead = AESGCM(key)
+    for index, (segment, last) in enumerate(_segments(chunks, segment_size + TAG_SIZE)):
+        try:
+            yield aead.decrypt(_segment_nonce(nonce_prefix, index, last), segment, None)
+        except InvalidTag:
+            raise ConcealerError("Incorrect key/password or corrupted data!")
+
+
+def is_compressible(sample):
+    """Guess from the first bytes of a payload whether compressing it is worthwhile"""
+    if len(sample) < 64 or sample.startswith(COMPRESSED_SIGNATURES):
+        return False
+    if sample[4:8] == b'ftyp' or (sample[:4] == b'RIFF' and sample[8:12] == b'WEBP'):
+        return False  # MP4/MOV/HEIC and WebP
+    
+    # A quick low-level zlib pass tells already-dense data apart from text, logs and CSV
+    return len(zlib.compress(sample, 1)) < len(sample) * COMPRESSIBLE_RATIO
+
+
+def _compressor(compression):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compressobj()
+    if compression == COMPRESSION_LZMA:
+        return lzma.LZMACompressor()
+    return bz2.BZ2Compressor()
+
+
+def _decompressor(compression):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompressobj()
+    if compression == COMPRESSION_LZMA:
+        return lzma.LZMADecompressor()
+    return bz2.BZ2Decompressor()
+
+
+def compress_stream(chunks, compression):
+    """Compress chunks with the given algorithm, yielding compressed data as it is produced"""
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _decompress_pending(decompressor, data):
+    """Whether a decompressor that just returned data still has output or input left over"""
+    if isinstance(decompressor, (lzma.LZMADecompressor, bz2.BZ2Decompressor)):
+        return not decompressor.needs_input
+    return bool(decompressor.unconsumed_tail) or len(data) == DECOMPRESS_CHUNK_SIZE
+
+
+def decompress_stream(chunks, compression):
+    """Decompress chunks with the given algorithm, yielding at most DECOMPRESS_CHUNK_SIZE bytes at a time"""
+    decompressor = _decompressor(compression)
+    try:
+        for chunk in chunks:
+            data = decompressor.decompress(chunk, DECOMPRESS_CHUNK_SIZE)
+            while True:
+                if data:
+                    yield data
+                if decompressor.eof or not _decompress_pending(decompressor, data):
+                    break
+                data = decompressor.decompress(getattr(decompressor, 'unconsumed_tail', b''), DECOMPRESS_CHUNK_SIZE)
+    except (zlib.error, lzma.LZMAError, OSError, EOFError):
+        raise ConcealerError("Corrupted compressed data!")
+    if not decompressor.eof:
+        raise ConcealerError("Corrupted compressed data!")
+
+
+def check_bits_per_channel(bits_per_channel):
+    """Raise ConcealerError unless bits_per_channel is a whole number of bits that reveal accepts"""
+    if (type(bits_per_channel) is not int
+            or not MIN_BITS_PER_CHANNEL <= bits_per_channel <= MAX_BITS_PER_CHANNEL):
+        raise ConcealerError(f"Bits per channel must be between {MIN_BITS_PER_CHANNEL} "
+                             f"and {MAX_BITS_PER_CHANNEL}!")
+
+
+def _group_shape(bits_per_channel):
+    """Return how many bytes and channel units make up one whole group of bits"""
+    common = math.gcd(8, bits_per_channel)
+    return bits_per_channel // common, 8 // common
+
+
+def _bytes_to_units(data, bits_per_channel):
+    """Split data into big-endian groups of bits_per_channel bits, one uint8 per group"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    if bits_per_channel == 1:
+        return np.unpackbits(data)
+    
+    # Join whole groups of bytes into words, then shift every unit out into its own stride
+    group_bytes, group_units = _group_shape(bits_per_channel)
+    words = data
+    if group_bytes > 1:
+        padded = np.zeros(-(-data.size // group_bytes) * group_bytes, dtype=np.uint8)
+        padded[:data.size] = data
+        padded = padded.reshape(-1, group_bytes).astype(np.uint32)
+        words = np.zeros(padded.shape[0], dtype=np.uint32)
+        for index in range(group_bytes):
+            words |= padded[:, index] << (8 * (group_bytes - 1 - index))
+    
+    mask = (1 << bits_per_channel) - 1
+    units = np.empty(words.size * group_units, dtype=np.uint8)
+    for index in range(group_units):
+        shift = bits_per_channel * (group_units - 1 - index)
+        units[index::group_units] = (words >> shift) & mask
+    return units[:-(-data.size * 8 // bits_per_channel)]
+
+
+def _units_to_bytes(units, bits_per_channel, length):
+    """Reassemble length bytes from groups of bits_per_channel bits"""
+    if bits_per_channel == 1:
+        return np.packbits(units).tobytes()[:length]
+    
+    group_bytes, group_units = _group_shape(bits_per_channel)
+    groups = -(-length // group_bytes)
+    units = units[:groups * group_units]
+    if units.size < groups * group_units:
+        units = np.concatenate((units, np.zeros(groups * group_units - units.size, dtype=np.uint8)))
+    
+    word_type = np.uint8 if group_bytes == 1 else np.uint32
+    words = np.zeros(groups, dtype=word_type)
+    for index in range(group_units):
+        shift = bits_per_channel * (group_units - 1 - index)
+        words |= units[index::group_units].astype(word_type, copy=False) << shift
+    
+    if group_bytes == 1:
+        return words.tobytes()[:length]
+    data = np.empty(groups * group_bytes, dtype=np.uint8)
+    for index in range(group_bytes):
+        data[index::group_bytes] = (words >> (8 * (group_bytes - 1 - index))) & 0xFF
+    return data.tobytes()[:length]
+
+
+def _row_bands(img_array, count, bits_per_channel, workers):
+    """Split count payload channels into bands of whole rows and bit groups, one per worker"""
+    if workers <= 1 or count < 2 * MIN_BAND_CHANNELS:
+        return [(0, count)]
+    
+    # Bands start on whole rows and whole byte groups so each one can be packed on its own
+    row_channels = img_array.size // img_array.shape[0] if img_array.ndim > 1 else 1
+    _, group_units = _group_shape(bits_per_channel)
+    step = row_channels * group_units // math.gcd(row_channels, group_units)
+    band = max(-(-count // workers), MIN_BAND_CHANNELS)
+    band = -(-band // step) * step
+    return [(start, min(count, start + band)) for start in range(0, count, band)]
+
+
+def _map_bands(function, bands, workers):
+    """Run function over every (start, stop) band, in parallel when there is more than one"""
+    if len(bands) == 1:
+        return [function(*bands[0])]
+    
+    # NumPy releases the GIL inside these bulk operations, so threads use separate cores
+    with ThreadPoolExecutor(max_workers=min(workers, len(bands))) as pool:
+        return list(pool.map(lambda band: function(*band), bands))
+
+
+def embed_bits(img_array, data, offset=0, bits_per_channel=1, workers=1):
+    """Write data into the low bits of img_array in place, starting at channel offset"""
+    check_bits_per_channel(bits_per_channel)
+    flat_img = img_array.reshape(-1)
+    count = -(-len(data) * 8 // bits_per_channel)
+    if offset + count > flat_img.size:
+        raise ConcealerError("Image is too small to hold the file data!")
+    
+    group_bytes, group_units = _group_shape(bits_per_channel)
+    keep_mask = 0xFF ^ ((1 << bits_per_channel) - 1)
+    data = memoryview(data)
+    
+    def embed_band(start, stop):
+        units = _bytes_to_units(data[start // group_units * group_bytes:
+                                     -(-stop // group_units) * group_bytes], bits_per_channel)
+        
+        # Clear and set the low bits of every touched channel in place
+        target = flat_img[offset + start:offset + stop]
+        np.bitwise_and(target, keep_mask, out=target)
+        np.bitwise_or(target, units[:stop - start], out=target)
+    
+    _map_bands(embed_band, _row_bands(img_array, count, bits_per_channel, workers), workers)
+    return img_array
+
+
+def extract_bits(img_array, offset, length, bits_per_channel=1, workers=1):
+    """Return length bytes read from the low bits of img_array, starting at channel offset"""
+    flat_img = img_array.reshape(-1)
+    count = -(-length * 8 // bits_per_channel)
+    if offset + count > flat_img.size:
+        raise ConcealerError("Hidden data is larger than the image!")
+    
+    group_bytes, group_units = _group_shape(bits_per_channel)
+    value_mask = (1 << bits_per_channel) - 1
+    
+    def extract_band(start, stop):
+        units = flat_img[offset + start:offset + stop] & value_mask
+        first = start // group_units * group_bytes
+        last = length if stop == count else stop // group_units * group_bytes
+        return _units_to_bytes(units, bits_per_channel, last - first)
+    
+    bands = _row_bands(img_array, count, bits_per_channel, workers)
+    return b''.join(_map_bands(extract_band, bands, workers))
+
+
+class PayloadWriter:
+    """Streams payload bytes into the low bits of an image, starting at a channel offset"""
+    
+    def __init__(self, img_array, offset, bits_per_channel=1, workers=1):
+        self.img_array = img_array
+        self.channel = offset
+        self.bits_per_channel = bits_per_channel
+        self.workers = workers
+        self.length = 0
+        self.hash = payload_hash()
+        self._pending = bytearray()
+    
+    def write(self, data):
+        """Queue data, embedding it once enough has been buffered"""
+        self.hash.update(data)
+        self._pending += data
+        if len(self._pending) >= STREAM_BUFFER_SIZE:
+            self._flush(final=False)
+    
+    def _flush(self, final):
+        # Only whole bit groups can be embedded until the final flush
+        group_bytes, _ = _group_shape(self.bits_per_channel)
+        count = len(self._pending) if final else len(self._pending) - len(self._pending) % group_bytes
+        if count == 0:
+            return
+        
+        embed_bits(self.img_array, bytes(self._pending[:count]), self.channel,
+                   self.bits_per_channel, self.workers)
+        del self._pending[:count]
+        self.channel += count * 8 // self.bits_per_channel
+        self.length += count
+    
+    def close(self):
+        """Embed whatever is still buffered and return the total number of bytes written"""
+        self._flush(final=True)
+        return self.length
+
+
+def iter_payload(img_array, offset, length, bits_per_channel=1, workers=1, chunk_size=STREAM_BUFFER_SIZE):
+    """Yield length payload bytes from the low bits of img_array in chunks of about chunk_size"""
+    if offset + -(-length * 8 // bits_per_channel) > img_array.size:
+        raise ConcealerError("The hidden data is incomplete or corrupted!")
+    group_bytes, _ = _group_shape(bits_per_channel)
+    chunk_size = max(group_bytes, chunk_size - chunk_size % group_bytes)
+    position = 0
+    while position < length:
+        count = min(chunk_size, length - position)
+        yield extract_bits(img_array, offset + position * 8 // bits_per_channel, count,
+                           bits_per_channel, workers)
+        position += count
+
+
+def iter_verified(chunks, header):
+    """Pass payload chunks through, raising ConcealerError at the end if they do not match header's digest
+    
+    Headers before version 7 have no digest and are passed through unchecked.
+    """
+    if header.version < 7:
+        yield from chunks
+        return
+    digest = payload_hash()
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+    if not hmac.compare_digest(digest.digest(), header.payload_digest):
+        raise ConcealerError("The hidden data is corrupted!")
+
+
+def conceal_payload(img_array, payload, header, workers=1):
+    """Embed the header followed by the payload into img_array in place"""
+    header.payload_length = len(payload)
+    digest = payload_hash()
+    digest.update(payload)
+    header.payload_digest = digest.digest()
+    if header.payload_offset + header.payload_channels > img_array.size:
+        raise ConcealerError("Image is too small to hold the file data!")
+    
+    embed_bits(img_array, header.pack())
+    embed_bits(img_array, payload, header.payload_offset, header.bits_per_channel, workers)
+    return img_array
+
+
+def read_header(img_array):
+    """Decode the container header from the first pixels, or return None if there is none"""
+    if img_array.size < _PREAMBLE.size * 8:
+        return None
+    size = ContainerHeader.peek_size(extract_bits(img_array, 0, _PREAMBLE.size))
+    if size is None:
+        return None
+    return ContainerHeader.unpack(extract_bits(img_array, 0, size))
+
+
+def _find_marker(packed):
+    """Return the bit offset of the first legacy end marker in packed bytes, or -1"""
+    marker = int.from_bytes(LEGACY_MARKER, 'big')
+
+    # Fifteen consecutive ones always cover one whole 0xFF byte, so only the
+    # bytes at or just before a 0xFF byte can start the marker
+    full = np.flatnonzero(packed == 0xFF)
+    if full.size == 0:
+        return -1
+    starts = np.unique(np.concatenate((full - 1, full)))
+    starts = starts[starts >= 0]
+
+    # Pad with ones so a marker can never be completed by the padding
+    padded = np.concatenate((packed, np.full(2, 0xFF, dtype=np.uint8))).astype(np.uint32)
+    windows = (padded[starts] << 16) | (padded[starts + 1] << 8) | padded[starts + 2]
+
+    best = -1
+    for shift in range(8):
+        hits = np.flatnonzero(((windows >> (8 - shift)) & 0xFFFF) == marker)
+        if hits.size:
+            offset = int(starts[hits[0]]) * 8 + shift
+            best = offset if best < 0 else min(best, offset)
+    return best
+
+
+def read_legacy_payload(img_array):
+    """Return the bytes hidden before the end marker of an image made before the container header, or None
+
+    Growing windows of the least significant bits are searched, so the cost
+    stays proportional to the payload size rather than the image size.
+    """
+    flat_img = img_array.reshape(-1)
+    usable = flat_img.size - flat_img.size % 8
+    chunks = []
+    tail = np.empty(0, dtype=np.uint8)
+    position = 0
+    window = LEGACY_SEARCH_CHANNELS
+    while position < usable:
+        stop = min(usable, position + window)
+        packed = np.packbits(flat_img[position:stop] & 1)
+        chunks.append(packed)
+
+        # Keep the last two bytes so markers spanning windows are still found
+        offset = _find_marker(np.concatenate((tail, packed)))
+        if offset >= 0:
+            end = position // 8 - tail.size + offset // 8
+            return np.concatenate(chunks).tobytes()[:end]
+
+        tail = packed[-2:]
+        position = stop
+        window *= 2
+    return None
+
+
+def _legacy_encrypted(img_array):
+    """Whether the first pixels hold a salt and the start of a Fernet token, as legacy encrypted images do"""
+    size = LEGACY_SALT_SIZE + len(LEGACY_TOKEN_PREFIX)
+    if img_array.size < size * 8:
+        return False
+    return extract_bits(img_array, 0, size)[LEGACY_SALT_SIZE:] == LEGACY_TOKEN_PREFIX
+
+
+def _decode_legacy(data, keys, key_cache=None, progress=None, legacy=False):
+    """Decrypt a payload from read_legacy_payload, returning it as is only when legacy is set
+
+    Encrypted payloads are a 16-byte salt followed by a Fernet token, keyed
+    with PBKDF2-HMAC-SHA256 and PBKDF2_ITERATIONS. Every candidate key is
+    tried in turn, since these images have no key check. Anything else
+    cannot be told apart from the noise in an ordinary image, so it is only
+    returned when the caller asked for the legacy format.
+    """
+    if data[LEGACY_SALT_SIZE:LEGACY_SALT_SIZE + len(LEGACY_TOKEN_PREFIX)] != LEGACY_TOKEN_PREFIX:
+        if not legacy:
+            raise ConcealerError("No hidden data found in the image!")
+        return data
+    keys = _candidate_keys(keys)
+    _report(progress, 70, "🔐 Decrypting file data...")
+    salt, token = data[:LEGACY_SALT_SIZE], data[LEGACY_SALT_SIZE:]
+    for key in keys:
+        try:
+            return Fernet(derive_key(key, salt, PBKDF2_ITERATIONS, key_cache)).decrypt(token)
+        except InvalidToken:
+            pass
+    raise ConcealerError("Incorrect key/password or corrupted data!")
+
+
+def reveal_payload(img_array, header, workers=1):
+    """Return the payload described by header from img_array, checking its digest"""
+    return b''.join(iter_verified(iter_payload(img_array, header.payload_offset, header.payload_length,
+                                               header.bits_per_channel, workers), header))
+
+
+class ProgressMeter:
+    """Byte-accurate progress for one conceal or reveal, throttled for UI event loops
+    
+    Stage messages are passed on as report(percent, message). While a stage
+    streams bytes, tick(percent, rate, eta) is called at most once per
+    interval with the rate in bytes per second and the estimated seconds
+    left (None until the rate is known). Pass a meter as the progress argument
+    of the engine functions; a plain callable only gets the stage messages.
+    """
+    
+    def __init__(self, report=None, tick=None, interval=PROGRESS_INTERVAL):
+        self.report = report
+        self.tick = tick
+        self.interval = interval
+        self.stage(0)
+    
+    def __call__(self, percent, message):
+        """Pass on a stage message without restarting the byte count"""
+        if self.report is not None:
+            self.report(percent, message)
+    
+    def stage(self, percent, message=None, end=None, total=0):
+        """Start a stage that moves from percent to end as total bytes are processed"""
+        self.start = percent
+        self.end = percent if end is None else end
+        self.total = total
+        self.done = 0
+        self.started = self._last = time.perf_counter()
+        if message is not None:
+            self(percent, message)
+    
+    def advance(self, count):
+        """Count processed bytes, ticking if the interval has passed or the stage is done"""
+        self.done += count
+        if self.tick is None or self.total <= 0:
+            return
+        now = time.perf_counter()
+        if now - self._last < self.interval and self.done < self.total:
+            return
+        
+        self._last = now
+        fraction = min(1.0, self.done / self.total)
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - min(self.done, self.total)) / rate if rate else None
+        self.tick(self.start + int((self.end - self.start) * fraction), rate, eta)
+    
+    def metered(self, chunks):
+        """Yield chunks unchanged, counting each one as it is handed on"""
+        for chunk in chunks:
+            self.advance(len(chunk))
+            yield chunk
+
+
+def _meter(progress):
+    """Return progress as a ProgressMeter, wrapping a plain callback or None"""
+    return progress if isinstance(progress, ProgressMeter) else ProgressMeter(progress)
+
+
+def _check(cancel):
+    """Stop with ConcealCancelled if the optional token has been cancelled"""
+    if cancel is not None:
+        cancel.check()
+
+
+def _checked(chunks, cancel):
+    """Yield chunks unchanged, checking the optional cancel token before each one"""
+    for chunk in chunks:
+        _check(cancel)
+        yield chunk
+
+
+def _report(progress, percent, message):
+    """Forward a progress update to the optional callback"""
+    if progress is not None:
+        progress(percent, message)
+
+
+def _open_source(source):
+    """Return (binary file, length, owned) for bytes, a path or a binary file-like object"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), len(source), True
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), os.path.getsize(source), True
+    
+    try:
+        position = source.tell()
+        length = source.seek(0, io.SEEK_END) - position
+        source.seek(position)
+        return source, length, False
+    except (AttributeError, OSError):
+        # Unseekable streams are buffered so their length is known up front
+        data = source.read()
+        return io.BytesIO(data), len(data), True
+
+
+def _peek(stream, size):
+    """Read up to size bytes from a seekable stream without consuming them"""
+    position = stream.tell()
+    data = stream.read(size)
+    stream.seek(position)
+    return data
+
+
+def _read_chunks(stream, chunk_size=STREAM_BUFFER_SIZE):
+    """Yield the remaining contents of a binary file in chunks"""
+    return iter(lambda: stream.read(chunk_size), b'')
+
+
+def _open_image(source, cancel=None):
+    """Open an image given as bytes, a path or a file-like object without decoding its pixels
+    
+    With a CancelToken, the decoder reads the file through a wrapper that
+    checks it, so a cancel stops even a single long decode part way.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    img = Image.open(source)
+    if cancel is not None:
+        img.fp = _CancellableFile(img.fp, cancel)
+    return img
+
+
+def _tile(decoder, extents, offset, args):
+    """Build a decoder tile: a plain tuple before Pillow 11, which added the ImageFile._Tile named tuple"""
+    tile_type = getattr(ImageFile, '_Tile', None)
+    if tile_type is None:
+        return (decoder, extents, offset, args)
+    return tile_type(decoder, extents, offset, args)
+
+
+def _limit_rows(img, rows):
+    """Cut the pending tiles of an opened image short so only its first rows get decoded
+    
+    PNG and uncompressed BMP/TIFF data can stop after any row; bottom-up BMP
+    rows are stored last to first, so their tile starts further into the file.
+    Returns False and leaves the image alone for any other layout.
+    """
+    width, height = img.size
+    if not img.tile or img.info.get('interlace'):
+        return False
+    
+    tiles = []
+    for tile in img.tile:
+        decoder, (left, top, right, bottom), offset, args = tile
+        if decoder not in _ROW_LIMITED_DECODERS or (left, right) != (0, width):
+            return False
+        if top >= rows:
+            continue
+        if bottom > rows and decoder == 'raw' and isinstance(args, tuple) and len(args) > 2 and args[2] < 0:
+            if not args[1]:
+                return False
+            offset += (bottom - rows) * args[1]
+        tiles.append(_tile(decoder, (0, top, width, min(bottom, rows)), offset, args))
+    
+    img.tile = tiles
+    img._size = (width, rows)
+    # The rest of the file only matters to the full frame, so don't read through it afterwards
+    img.load_end = lambda: None
+    return True
+
+
+def _decode_pixels(img, rows=None, cancel=None):
+    """Decode an opened image into a new contiguous RGB array, one band of rows at a time
+    
+    Converting and copying the whole frame at once would briefly hold several
+    full copies of it. Band by band, only the decoded image and the array
+    exist together, and RGB images are copied without any conversion. With
+    rows, only that many rows from the top are returned, and decoded too where
+    the format allows it. A CancelToken given as cancel is checked before
+    every band.
+    """
+    width, height = img.size
+    if rows is not None and rows < height:
+        _limit_rows(img, rows)
+        height = rows
+    img_array = np.empty((height, width, 3), dtype=np.uint8)
+    rows = max(1, DECODE_BAND_SIZE // (width * 3))
+    for top in range(0, height, rows):
+        _check(cancel)
+        band = img.crop((0, top, width, min(height, top + rows)))
+        if band.mode != 'RGB':
+            band = band.convert('RGB')
+        img_array[top:top + band.height] = np.frombuffer(band.tobytes(), dtype=np.uint8).reshape(
+            band.height, width, 3)
+    return img_array
+
+
+def load_image(source, cancel=None):
+    """Decode an image given as bytes, a path or a file-like object into an RGB array"""
+    with _open_image(source, cancel) as img:
+        return _decode_pixels(img, cancel=cancel)
+
+
+def output_extension(output_format=DEFAULT_OUTPUT_FORMAT):
+    """Return the file extension for one of OUTPUT_FORMATS"""
+    return OUTPUT_FORMATS[output_format][2]
+
+
+class _CancellableFile:
+    """Binary file wrapper that checks a CancelToken on every read and write
+    
+    It has no fileno(), so Pillow encodes through write() one buffer at a
+    time instead of handing the whole image to the encoder in one call, and
+    decodes through read() one block at a time.
+    """
+    
+    def __init__(self, file, cancel):
+        self.file = file
+        self.cancel = cancel
+    
+    def write(self, data):
+        self.cancel.check()
+        return self.file.write(data)
+    
+    def tell(self):
+        return self.file.tell()
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.file.seek(offset, whence)
+    
+    def read(self, size=-1):
+        self.cancel.check()
+        return self.file.read(size)
+    
+    def flush(self):
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+
+def save_image(image, output, output_format=DEFAULT_OUTPUT_FORMAT, cancel=None):
+    """Encode a concealed image losslessly to a path or binary file-like object
+    
+    With a CancelToken, encoders that write as they go can be stopped part way.
+    A path that was only partly written is then removed.
+    """
+    pil_format, options, _ = OUTPUT_FORMATS[output_format]
+    if pil_format == 'WEBP' and max(image.size) > WEBP_MAX_DIMENSION:
+        raise ConcealerError(f"WebP images are limited to {WEBP_MAX_DIMENSION} pixels per side, "
+                             f"please choose another output format!")
+    if cancel is None:
+        image.save(output, pil_format, **options)
+        return
+    
+    if not isinstance(output, (str, os.PathLike)):
+        image.save(_CancellableFile(output, cancel), pil_format, **options)
+        return
+    try:
+        with open(output, 'w+b') as f:
+            image.save(_CancellableFile(f, cancel), pil_format, **options)
+    except BaseException:
+        if os.path.exists(output):
+            os.remove(output)
+        raise
+
+
+def guess_extension(data):
+    """Return a file extension for data based on common file signatures"""
+    if data.startswith(b'PK'):  # ZIP file
+        return '.zip'
+    if data.startswith(b'\x89PNG'):  # PNG file
+        return '.png'
+    if data.startswith(b'\xff\xd8\xff'):  # JPEG file
+        return '.jpg'
+    if data.startswith(b'%PDF'):  # PDF file
+        return '.pdf'
+    return '.bin'
+
+
+def _conceal_header(length, key, bits_per_channel, salt, segment_size, compression, kdf):
+    """Build the header conceal_image writes for a payload of length bytes (before compression)"""
+    if not key:
+        return ContainerHeader(length, bits_per_channel=bits_per_channel, compression=compression)
+    return ContainerHeader(encrypted_length(length, segment_size), FLAG_ENCRYPTED,
+                           kdf.kdf, kdf.cost, salt, bits_per_channel,
+                           cipher=CIPHER_AES_GCM_STREAM, segment_size=segment_size,
+                           nonce_prefix=os.urandom(NONCE_PREFIX_SIZE), compression=compression,
+                           kdf_block_size=kdf.block_size, kdf_parallelism=kdf.parallelism)
+
+
+def _conceal_salt(key, salt, kdf):
+    """Return the salt to encrypt with, checking the KDF settings first"""
+    if not key:
+        return salt
+    kdf.validate()
+    salt = salt or os.urandom(kdf.salt_size)
+    if not MIN_SALT_SIZE <= len(salt) <= MAX_SALT_SIZE:
+        raise ConcealerError(f"The salt must be between {MIN_SALT_SIZE} and {MAX_SALT_SIZE} bytes!")
+    return salt
+
+
+def _estimate_compressed(sample, length, compression):
+    """Estimate the compressed size of a payload from how well its first bytes compress"""
+    compressor = _compressor(compression)
+    ratio = len(compressor.compress(sample) + compressor.flush()) / len(sample)
+    return min(length, math.ceil(length * ratio))
+
+
+class CapacityReport:
+    """How much payload a cover can hold and how much a given payload will need"""
+    
+    def __init__(self, width, height, mode, capacity, required, estimated):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.capacity = capacity
+        self.required = required
+        self.estimated = estimated
+    
+    @property
+    def fits(self):
+        return self.required <= self.capacity
+
+
+def estimate_payload(payload, compression=COMPRESSION_NONE):
+    """Return (length, compression) for payload as it will be stored, before encryption
+    
+    Only the first bytes of the payload are sampled. A compressed length is
+    estimated from how well they compress, and compression becomes
+    COMPRESSION_NONE when they show the payload is already compressed.
+    """
+    stream, length, owned = _open_source(payload)
+    try:
+        sample = _peek(stream, COMPRESSION_SAMPLE_SIZE)
+    finally:
+        if owned:
+            stream.close()
+    
+    if compression == COMPRESSION_NONE or not is_compressible(sample):
+        return length, COMPRESSION_NONE
+    return _estimate_compressed(sample, length, compression), compression
+
+
+def check_capacity(payload, cover, key=None, bits_per_channel=1, segment_size=DEFAULT_SEGMENT_SIZE,
+                   compression=COMPRESSION_NONE, kdf=None, estimate=None):
+    """Check whether payload will fit in cover without decoding the cover's pixels
+    
+    Only the image header is read for the dimensions, and only the first
+    bytes of the payload are sampled. capacity and required are in stored
+    payload bytes, after the container header and encryption overhead. When
+    the payload is compressed, required is estimated from the sample and
+    estimated is set. To check one payload against several covers, pass
+    the result of estimate_payload as estimate so it is sampled only once.
+    """
+    check_bits_per_channel(bits_per_channel)
+    with _open_image(cover) as img:
+        width, height = img.size
+        mode = img.mode
+    
+    length, compression = estimate or estimate_payload(payload, compression)
+    estimated = compression != COMPRESSION_NONE
+    
+    kdf = _kdf_params(kdf)
+    header = _conceal_header(length, key, bits_per_channel, bytes(kdf.salt_size), segment_size, compression, kdf)
+    capacity = max(0, width * height * 3 - header.payload_offset) * bits_per_channel // 8
+    return CapacityReport(width, height, mode, capacity, header.payload_length, estimated)
+
+
+def conceal_image(payload, cover, key=None, bits_per_channel=1, workers=DEFAULT_WORKERS, progress=None,
+                  key_cache=None, salt=None, segment_size=DEFAULT_SEGMENT_SIZE, compression=COMPRESSION_NONE,
+                  cancel=None, kdf=None):
+    """Hide payload in cover and return the concealed image as a PIL image
+    
+    The payload is read, compressed, encrypted and embedded as a stream, so
+    only one buffer of it is held in memory at a time. Compression is skipped
+    when a sample of the payload shows it is already compressed. A batch can
+    pass the same salt and key_cache to every call so the key is derived only
+    once. A CancelToken given as cancel is checked between chunks. kdf is a
+    KdfParams choosing the key derivation (PBKDF2 with PBKDF2_ITERATIONS by
+    default); it is recorded in the header for reveal.
+    """
+    check_bits_per_channel(bits_per_channel)
+    progress = _meter(progress)
+    kdf = _kdf_params(kdf)
+    _report(progress, 10, "📷 Loading cover image...")
+    stream, length, owned = _open_source(payload)
+    try:
+        if compression != COMPRESSION_NONE and not is_compressible(_peek(stream, COMPRESSION_SAMPLE_SIZE)):
+            _report(progress, 15, "🗜️ File is already compressed, skipping compression...")
+            compression = COMPRESSION_NONE
+        
+        salt = _conceal_salt(key, salt, kdf)
+        header = _conceal_header(length, key, bits_per_channel, salt, segment_size, compression, kdf)
+        chunk_size = STREAM_BUFFER_SIZE if compression == COMPRESSION_NONE else COMPRESS_CHUNK_SIZE
+        chunks = progress.metered(_checked(_read_chunks(stream, chunk_size), cancel))
+        
+        img = _open_image(cover, cancel)
+        try:
+            # Fail before decoding the cover if the payload cannot fit
+            # (compressed payloads are only checked as they are embedded)
+            width, height = img.size
+            if compression == COMPRESSION_NONE and header.payload_offset + header.payload_channels > width * height * 3:
+                raise ConcealerError("Image is too small to hold the file data!")
+            img_array = _decode_pixels(img, cancel=cancel)
+        finally:
+            # close() frees the decoded frame as well as the file, before the payload is embedded
+            img.close()
+        _check(cancel)
+        
+        if compression != COMPRESSION_NONE:
+            _report(progress, 20, "🗜️ Compressing file data...")
+            chunks = compress_stream(chunks, compression)
+        chunks = _encrypt_chunks(chunks, header, key, key_cache, progress)
+        
+        # Reading, compressing and encrypting all happen as the chunks are embedded
+        progress.stage(40, "🔄 Concealing data in image...", 80, length)
+        writer = PayloadWriter(img_array, header.payload_offset, bits_per_channel, workers)
+        for chunk in chunks:
+            writer.write(chunk)
+        
+        # The header goes in last, once the exact payload length is known
+        header.payload_length = writer.close()
+        header.payload_digest = writer.hash.digest()
+        embed_bits(img_array, header.pack())
+    finally:
+        if owned:
+            stream.close()
+    
+    return Image.fromarray(img_array)
+
+
+def _encrypt_chunks(chunks, header, key, key_cache, progress):
+    """Encrypt payload chunks as described by header when a key is given"""
+    if not key:
+        return chunks
+    _report(progress, 25, "🔐 Encrypting file data...")
+    derived = derive_key(key, header.salt, header.kdf_params, key_cache)
+    header.key_check = key_check(derived, header.nonce_prefix)
+    return encrypt_stream(base64.urlsafe_b64decode(derived), header.nonce_prefix, chunks, header.segment_size)
+
+
+def _write_exactly(writer, chunks, pending, size):
+    """Write exactly size bytes to writer, starting with the leftover pending view, and return the new leftover"""
+    while size:
+        if not pending:
+            pending = memoryview(next(chunks, b''))
+            if not pending:
+                raise ConcealerError("The file changed while it was being concealed!")
+        data, pending = pending[:size], pending[size:]
+        writer.write(data)
+        size -= len(data)
+    return pending
+
+
+def _save_shard(img_array, output, output_format, cancel):
+    save_image(Image.fromarray(img_array), output, output_format, cancel)
+
+
+def conceal_split(payload, covers, outputs, key=None, bits_per_channel=1, workers=DEFAULT_WORKERS,
+                  progress=None, key_cache=None, salt=None, segment_size=DEFAULT_SEGMENT_SIZE,
+                  compression=COMPRESSION_NONE, output_format=DEFAULT_OUTPUT_FORMAT, cancel=None, kdf=None):
+    """Hide payload across several covers, saving one concealed image per cover it needs
+    
+    The stored (compressed and encrypted) stream is cut into consecutive
+    shards that fill the covers in order. Every shard has its own header with
+    a shared random set ID, its index and the shard count. The next cover is
+    decoded and finished shards are encoded on other threads while the
+    current shard is embedded. Returns the outputs that were written; covers
+    that are not needed are left unused. If the split fails or is cancelled,
+    the images it already wrote are removed again.
+    """
+    if len(covers) != len(outputs):
+        raise ValueError("covers and outputs must have the same length")
+    if not 0 < len(covers) <= MAX_SHARDS:
+        raise ConcealerError(f"Select between 1 and {MAX_SHARDS} cover images!")
+    check_bits_per_channel(bits_per_channel)
+    
+    progress = _meter(progress)
+    kdf = _kdf_params(kdf)
+    _report(progress, 5, "📷 Reading cover images...")
+    stream, length, owned = _open_source(payload)
+    try:
+        if compression != COMPRESSION_NONE and not is_compressible(_peek(stream, COMPRESSION_SAMPLE_SIZE)):
+            _report(progress, 10, "🗜️ File is already compressed, skipping compression...")
+            compression = COMPRESSION_NONE
+        
+        if compression != COMPRESSION_NONE:
+            # Compress up front so the shard sizes are known before any cover is filled
+            progress.stage(10, "🗜️ Compressing file data...", 30, length)
+            spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            for data in compress_stream(progress.metered(_checked(_read_chunks(stream, COMPRESS_CHUNK_SIZE), cancel)),
+                                        compression):
+                spooled.write(data)
+            length = spooled.tell()
+            spooled.seek(0)
+            if owned:
+                stream.close()
+            stream, owned = spooled, True
+        
+        salt = _conceal_salt(key, salt, kdf)
+        header = _conceal_header(length, key, bits_per_channel, salt, segment_size, compression, kdf)
+        header.set_id = os.urandom(SET_ID_SIZE)
+        
+        # Fill the covers in order, using only as many as the payload needs
+        sizes = []
+        remaining = header.payload_length
+        for cover in covers:
+            with _open_image(cover) as img:
+                width, height = img.size
+            sizes.append(min(remaining, max(0, width * height * 3 - header.payload_offset) * bits_per_channel // 8))
+            remaining -= sizes[-1]
+            if not remaining:
+                break
+        if remaining:
+            raise ConcealerError("The images are too small to hold the file data!")
+        while len(sizes) > 1 and not sizes[-1]:
+            sizes.pop()
+        
+        chunks = _encrypt_chunks(_checked(_read_chunks(stream), cancel), header, key, key_cache, progress)
+        chunks = iter(progress.metered(chunks))
+        pending = memoryview(b'')
+        count = len(sizes)
+        progress.stage(30, None, 90, header.payload_length)
+        written = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max(2, workers)) as pool:
+                decoding = pool.submit(load_image, covers[0], cancel)
+                saving = []
+                for index, size in enumerate(sizes):
+                    _report(progress, 30 + 60 * index // count, f"🔄 Concealing part {index + 1} of {count}...")
+                    img_array = decoding.result()
+                    _check(cancel)
+                    if index + 1 < count:
+                        decoding = pool.submit(load_image, covers[index + 1], cancel)
+                    
+                    writer = PayloadWriter(img_array, header.payload_offset, bits_per_channel, workers)
+                    pending = _write_exactly(writer, chunks, pending, size)
+                    
+                    shard_header = copy.copy(header)
+                    shard_header.payload_length = writer.close()
+                    shard_header.payload_digest = writer.hash.digest()
+                    shard_header.shard_index = index
+                    shard_header.shard_count = count
+                    embed_bits(img_array, shard_header.pack())
+                    
+                    # Keep only a few finished shards waiting to be encoded at a time
+                    saving.append(pool.submit(_save_shard, img_array, outputs[index], output_format, cancel))
+                    written += 1
+                    del img_array, writer
+                    while len(saving) > max(1, workers - 1):
+                        saving.pop(0).result()
+                
+                _report(progress, 90, "💾 Saving concealed images...")
+                for future in saving:
+                    future.result()
+        except BaseException:
+            # A partial set cannot be revealed, so don't leave any of it behind
+            for output in outputs[:written]:
+                if os.path.exists(output):
+                    os.remove(output)
+            raise
+    finally:
+        if owned:
+            stream.close()
+    
+    _report(progress, 100, f"✅ File concealed across {count} image(s)!")
+    return list(outputs[:count])
+
+
+def conceal(payload, cover, key=None, bits_per_channel=1, workers=DEFAULT_WORKERS, progress=None,
+            key_cache=None, salt=None, compression=COMPRESSION_NONE, output_format=DEFAULT_OUTPUT_FORMAT,
+            cancel=None, kdf=None):
+    """Hide payload in cover and return the concealed image encoded in output_format (fast PNG by default)
+
+    payload and cover may each be bytes, a path or a binary file-like object.
+    progress, if given, is called as progress(percent, message), or may be a
+    ProgressMeter to also get throttled byte counts with rate and ETA.
+    """
+    progress = _meter(progress)
+    image = conceal_image(payload, cover, key, bits_per_channel, workers, progress, key_cache, salt,
+                          compression=compression, cancel=cancel, kdf=kdf)
+    
+    _check(cancel)
+    _report(progress, 80, "💾 Saving concealed image...")
+    output = io.BytesIO()
+    save_image(image, output, output_format, cancel)
+    
+    _report(progress, 100, "✅ File concealed successfully!")
+    return output.getvalue()
+
+
+def _decode_chunks(chunks, header, derived, progress=None):
+    """Decrypt with the key from unlock_key and decompress stored payload chunks as described by header"""
+    if header.encrypted:
+        _report(progress, 25, "🔐 Decrypting file data...")
+    if header.cipher == CIPHER_AES_GCM_STREAM:
+        chunks = decrypt_stream(base64.urlsafe_b64decode(derived), header.nonce_prefix, chunks, header.segment_size)
+    elif header.cipher == CIPHER_FERNET:
+        # Images concealed before the streaming format hold a single Fernet token
+        try:
+            chunks = [Fernet(derived).decrypt(b''.join(chunks))]
+        except InvalidToken:
+            raise ConcealerError("Incorrect key/password or corrupted data!")
+    
+    if header.compression != COMPRESSION_NONE:
+        chunks = decompress_stream(chunks, header.compression)
+    return chunks
+
+
+def _rows_for(channels, width):
+    """Number of pixel rows that hold the first channels color channels"""
+    return -(-channels // (width * 3))
+
+
+def read_image_header(image):
+    """Return the container header of an image given as bytes, a path or a file-like object, or None
+    
+    Only the rows that can hold the largest possible header are decoded.
+    """
+    with _open_image(image) as img:
+        return read_header(_decode_pixels(img, _rows_for(MAX_HEADER_SIZE * 8, img.width)))
+
+
+def _load_payload_rows(image, header, cancel=None):
+    """Decode only the rows of an image that hold header and its payload"""
+    with _open_image(image, cancel) as img:
+        return _decode_pixels(img, _rows_for(header.payload_offset + header.payload_channels, img.width), cancel)
+
+
+def _load_payload_image(image, verify=None, cancel=None):
+    """Return the header of an image and the rows holding it and its payload
+
+    PNG and uncompressed BMP/TIFF images are opened twice, decoding only the
+    header rows first, so the work grows with the payload instead of the
+    cover. Other formats are decoded once in full. verify, if given, is
+    called as verify(header, rows) with the header (or None) and the rows
+    decoded so far, before the payload rows are decoded. Without a header,
+    (None, the whole image) is returned for the legacy end-marker format,
+    unless verify raises to stop it first.
+    """
+    if not isinstance(image, (bytes, bytearray, memoryview, str, os.PathLike)):
+        image = image.read()
+    with _open_image(image, cancel) as img:
+        rows = _rows_for(MAX_HEADER_SIZE * 8, img.width)
+        if rows >= img.height or not _limit_rows(img, rows):
+            img_array = _decode_pixels(img, cancel=cancel)
+            header = read_header(img_array)
+            if verify is not None:
+                verify(header, img_array)
+            return header, img_array
+        head = _decode_pixels(img, cancel=cancel)
+        header = read_header(head)
+    if verify is not None:
+        verify(header, head)
+    del head
+    if header is None:
+        return None, load_image(image, cancel)
+    return header, _load_payload_rows(image, header, cancel)
+
+
+def _reveal_chunks(image, key, workers, progress, key_cache, cancel, legacy=False, max_kdf_cost=None):
+    """Yield the payload hidden in image as it is extracted, decrypted and decompressed"""
+    _report(progress, 10, "📷 Loading concealed image...")
+    derived = None
+    
+    def verify(header, rows):
+        # Runs between the header and payload decodes, so a wrong key skips the payload entirely
+        nonlocal derived
+        _check(cancel)
+        if header is None:
+            # Only images that start like a legacy salt and Fernet token are decoded in full and
+            # searched for the end marker, unless the caller asked for the legacy format
+            if not legacy and not _legacy_encrypted(rows):
+                raise ConcealerError("No hidden data found in the image!")
+            return
+        if header.shard_count > 1:
+            raise ConcealerError(f"This image is part {header.shard_index + 1} of a set of {header.shard_count}. "
+                                 f"Please reveal all images of the set together!")
+        derived = unlock_key(header, key, key_cache, max_kdf_cost)
+    
+    header, img_array = _load_payload_image(image, verify, cancel)
+    _check(cancel)
+    if header is None:
+        # Images made before the container header mark the end of their payload instead
+        _report(progress, 30, "🔍 Extracting hidden data...")
+        file_data = read_legacy_payload(img_array)
+        if not file_data:
+            raise ConcealerError("No hidden data found in the image!")
+        del img_array
+        yield _decode_legacy(file_data, key, key_cache, progress, legacy)
+        return
+
+    # Extract exactly the payload described by the header
+    chunks = iter_payload(img_array, header.payload_offset, header.payload_length,
+                          header.bits_per_channel, workers)
+    chunks = iter_verified(chunks, header)
+    chunks = _decode_chunks(progress.metered(_checked(chunks, cancel)), header, derived, progress)
+    progress.stage(30, "🔍 Extracting hidden data...", 90, header.payload_length)
+    yield from chunks
+
+
+def _reveal_split_chunks(images, key, workers, progress, key_cache, cancel, max_kdf_cost=None):
+    """Yield the payload hidden across a set of images, decoding the next image on another thread"""
+    _report(progress, 5, "🔍 Reading image headers...")
+    shards = []
+    for image in images:
+        _check(cancel)
+        header = read_image_header(image)
+        if header is None:
+            raise ConcealerError("No hidden data found in one of the images!")
+        shards.append((header.shard_index, header, image))
+    if not shards:
+        raise ConcealerError("No images selected!")
+    
+    shards.sort(key=lambda shard: shard[0])
+    first = shards[0][1]
+    if any(header.set_id != first.set_id for _, header, _ in shards):
+        raise ConcealerError("The images do not all belong to the same set!")
+    indices = [index for index, _, _ in shards]
+    missing = sorted(set(range(first.shard_count)) - set(indices))
+    if missing:
+        raise ConcealerError(f"Part {missing[0] + 1} of {first.shard_count} is missing from the set!")
+    if len(indices) != first.shard_count:
+        raise ConcealerError("The same image was selected more than once!")
+    derived = unlock_key(first, key, key_cache, max_kdf_cost)
+    
+    def shard_chunks(pool):
+        decoding = pool.submit(_load_payload_rows, shards[0][2], shards[0][1], cancel)
+        for position, (index, header, _) in enumerate(shards):
+            _report(progress, 30 + 60 * position // len(shards),
+                    f"🔍 Extracting part {index + 1} of {len(shards)}...")
+            img_array = decoding.result()
+            if position + 1 < len(shards):
+                decoding = pool.submit(_load_payload_rows, shards[position + 1][2], shards[position + 1][1], cancel)
+            yield from iter_verified(iter_payload(img_array, header.payload_offset, header.payload_length,
+                                                  header.bits_per_channel, workers), header)
+            del img_array
+    
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        chunks = _decode_chunks(progress.metered(_checked(shard_chunks(pool), cancel)), first, derived, progress)
+        progress.stage(30, None, 90, sum(header.payload_length for _, header, _ in shards))
+        yield from chunks
+
+
+def _revealed_name(image):
+    """Base name for the file revealed from image: the image's name, or 'hidden' for bytes and streams"""
+    if isinstance(image, (str, os.PathLike)):
+        return os.path.splitext(os.path.basename(image))[0]
+    return "hidden"
+
+
+def _write_revealed(chunks, output, name, cancel):
+    """Stream revealed chunks into output and return the path written
+    
+    output is a file path, or a directory where the file is named
+    NAME_revealed with the extension guessed from its first bytes. The data
+    goes to a hidden .part file next to the output, which is renamed into
+    place only after the last chunk has been written and verified.
+    """
+    chunks = iter(chunks)
+    head = bytearray()
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= SIGNATURE_SIZE:
+            break
+    
+    if os.path.isdir(output):
+        output = os.path.join(output, f"{name}_revealed{guess_extension(bytes(head[:SIGNATURE_SIZE]))}")
+    directory, base_name = os.path.split(output)
+    partial = os.path.join(directory, f".{base_name}.{os.urandom(4).hex()}.part")
+    try:
+        with open(partial, 'xb') as f:
+            f.write(head)
+            del head
+            for chunk in chunks:
+                f.write(chunk)
+            _check(cancel)
+        os.replace(partial, output)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return output
+
+
+def reveal(image, key=None, workers=DEFAULT_WORKERS, progress=None, key_cache=None, cancel=None, legacy=False,
+           max_kdf_cost=None):
+    """Return the payload hidden in image
+
+    image may be bytes, a path or a binary file-like object.
+    key may be one password or a list of candidate passwords to try.
+    progress, if given, is called as progress(percent, message), or may be a
+    ProgressMeter to also get throttled byte counts with rate and ETA.
+    key_cache, if given, is a KeyCache shared by the reveals of one batch.
+    cancel, if given, is a CancelToken checked between chunks.
+    Images without a container header are only revealed when they hold an
+    encrypted payload from the original end-marker format. Set legacy to
+    also accept unencrypted end-marker payloads, which cannot be told apart
+    from an image without hidden data.
+    max_kdf_cost, if given, rejects images whose key derivation would take
+    more than this many PBKDF2 iterations or scrypt N*r*p before any key is
+    derived; without it, only the MAX_PBKDF2_ITERATIONS and MAX_SCRYPT_WORK
+    limits apply.
+    """
+    progress = _meter(progress)
+    file_data = b''.join(_reveal_chunks(image, key, workers, progress, key_cache, cancel, legacy, max_kdf_cost))
+    
+    _report(progress, 100, "✅ File revealed successfully!")
+    return file_data
+
+
+def reveal_to_file(image, output, key=None, workers=DEFAULT_WORKERS, progress=None, key_cache=None, cancel=None,
+                   legacy=False, max_kdf_cost=None):
+    """Reveal the payload hidden in image straight into a file and return its path
+    
+    output is a file path, or a directory where the file is named after the
+    image with the extension guessed from its contents. The payload is
+    written chunk by chunk as it is extracted, decrypted and decompressed,
+    so memory use does not grow with it beyond the image rows that hold it.
+    The file appears only once the whole payload has been verified; a
+    failed or cancelled reveal leaves nothing behind. The other arguments
+    are as for reveal.
+    """
+    progress = _meter(progress)
+    output = _write_revealed(_reveal_chunks(image, key, workers, progress, key_cache, cancel, legacy, max_kdf_cost),
+                             output, _revealed_name(image), cancel)
+    
+    _report(progress, 100, "✅ File revealed successfully!")
+    return output
+
+
+def reveal_split(images, key=None, workers=DEFAULT_WORKERS, progress=None, key_cache=None, cancel=None,
+                 max_kdf_cost=None):
+    """Return the payload hidden across a set of images made by conceal_split, given in any order
+    
+    The shards are read back in order and streamed through decryption and
+    decompression while the next image is decoded on another thread.
+    """
+    progress = _meter(progress)
+    file_data = b''.join(_reveal_split_chunks(images, key, workers, progress, key_cache, cancel, max_kdf_cost))
+    
+    _report(progress, 100, "✅ File revealed successfully!")
+    return file_data
+
+
+def reveal_split_to_file(images, output, key=None, workers=DEFAULT_WORKERS, progress=None, key_cache=None,
+                         cancel=None, max_kdf_cost=None):
+    """Reveal the payload hidden across a set of images straight into a file and return its path
+    
+    Works like reveal_to_file; in a directory the file is named after the
+    first image in sorted order. Only one image's rows are held at a time,
+    plus the next one being decoded.
+    """
+    progress = _meter(progress)
+    images = list(images)
+    paths = sorted(os.fspath(image) for image in images if isinstance(image, (str, os.PathLike)))
+    name = _revealed_name(paths[0]) if paths else "hidden"
+    output = _write_revealed(_reveal_split_chunks(images, key, workers, progress, key_cache, cancel, max_kdf_cost),
+                             output, name, cancel)
+    
+    _report(progress, 100, "✅ File revealed successfully!")
+    return output
@@ -0,0 +1,407 @@
+import sys
+import os
+import json
+import hmac
+import time
+import shutil
+import socket
+import signal
+import asyncio
+import argparse
+import secrets
+import tempfile
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concealer_core import (ConcealerError, DEFAULT_WORKERS, PBKDF2_ITERATIONS, SCRYPT_COST, SALT_SIZE,
+                            MIN_PBKDF2_ITERATIONS, KDF_NAMES, KDF_PBKDF2_SHA256, KDF_SCRYPT, COMPRESSION_NAMES,
+                            OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, KdfParams, KeyCache, ProgressMeter,
+                            conceal_image, conceal_split, reveal_to_file, reveal_split_to_file, save_image,
+                            output_extension, check_bits_per_channel)
+
+
+# Unix socket used when none is given; platforms without AF_UNIX listen on DEFAULT_PORT instead
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'file_concealer.sock')
+DEFAULT_PORT = 8765
+
+# Shared secret a TCP client must send, since any local user can connect to a port;
+# the file is readable only by the user who started the service
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.file_concealer_token')
+
+# Longest request line accepted, and the size of the blocks results are streamed back in
+MAX_REQUEST_SIZE = 1 << 20
+STREAM_CHUNK_SIZE = 1 << 20
+
+OPERATIONS = ('ping', 'conceal', 'reveal')
+
+# Per-worker state, set up once when the pool starts the process
+_key_cache = None
+_events = None
+
+
+def _init_worker(events, key_cache_size):
+    """Give the worker its progress channel and a key cache kept for the life of the service"""
+    global _key_cache, _events
+    _key_cache = KeyCache(key_cache_size)
+    _events = events
+
+
+def warm_up():
+    """Pay the first-use costs of the crypto backend in this worker before the first request does"""
+    KdfParams(KDF_PBKDF2_SHA256, MIN_PBKDF2_ITERATIONS).derive(b'warm up', bytes(SALT_SIZE))
+    KdfParams(KDF_SCRYPT, 1 << 10).derive(b'warm up', bytes(SALT_SIZE))
+    return os.getpid()
+
+
+def _job_meter(job_id):
+    """A ProgressMeter that sends the job's stage messages and byte rate back to the service"""
+    def report(percent, message):
+        _events.put((job_id, {'event': 'progress', 'percent': percent, 'message': message}))
+
+    def tick(percent, rate, eta):
+        _events.put((job_id, {'event': 'progress', 'percent': percent, 'rate': rate, 'eta': eta}))
+
+    return ProgressMeter(report, tick)
+
+
+def check_request(request):
+    """Raise ConcealerError unless request is a well-formed service request"""
+    if not isinstance(request, dict) or request.get('op') not in OPERATIONS:
+        raise ConcealerError(f"The request needs an 'op' of {', '.join(OPERATIONS)}!")
+    if request['op'] == 'conceal':
+        required = [('payload',), ('cover', 'covers')]
+    elif request['op'] == 'reveal':
+        required = [('image', 'images')]
+    else:
+        required = []
+    for names in required:
+        if not any(request.get(name) for name in names):
+            raise ConcealerError(f"The request is missing '{names[0]}'!")
+    if request['op'] == 'conceal':
+        # Checked here so a bad value is reported before a worker is tied up
+        check_bits_per_channel(request.get('bits', 1))
+    if request['op'] == 'reveal' and not isinstance(request.get('legacy', False), bool):
+        raise ConcealerError("The request's 'legacy' must be true or false!")
+
+
+def _kdf_params(request):
+    """Build the KdfParams asked for by a conceal request"""
+    kdf = KDF_NAMES.get(request.get('kdf', 'pbkdf2'))
+    if kdf is None:
+        raise ConcealerError(f"Unknown key derivation function {request['kdf']!r}!")
+    cost = request.get('kdf_cost') or (SCRYPT_COST if kdf == KDF_SCRYPT else PBKDF2_ITERATIONS)
+    params = KdfParams(kdf, cost, salt_size=request.get('salt_size', SALT_SIZE))
+    params.validate()
+    return params
+
+
+def conceal_job(job_id, request, spool):
+    """Run a conceal request in a worker and return its result record
+
+    With 'covers' the payload is split across them into the 'output'
+    directory. With one 'cover' the image goes to 'output', or into spool to
+    be streamed back when no output is given.
+    """
+    output_format = request.get('format', DEFAULT_OUTPUT_FORMAT)
+    compression = COMPRESSION_NAMES.get(request.get('compression', 'none'))
+    if output_format not in OUTPUT_FORMATS or compression is None:
+        raise ConcealerError("Unknown output format or compression!")
+    options = {'key': request.get('key'), 'bits_per_channel': request.get('bits', 1), 'workers': 1,
+               'progress': _job_meter(job_id), 'key_cache': _key_cache, 'compression': compression,
+               'kdf': _kdf_params(request)}
+
+    if 'covers' in request:
+        if not request.get('output'):
+            raise ConcealerError("Concealing across several covers needs an output directory!")
+        os.makedirs(request['output'], exist_ok=True)
+        extension = output_extension(output_format)
+        outputs = [os.path.join(request['output'],
+                                f"{os.path.splitext(os.path.basename(cover))[0]}_concealed{extension}")
+                   for cover in request['covers']]
+        if len(set(outputs)) != len(outputs):
+            raise ConcealerError("The covers must have different file names!")
+        used = conceal_split(request['payload'], request['covers'], outputs, output_format=output_format, **options)
+        return {'outputs': used}
+
+    image = conceal_image(request['payload'], request['cover'], **options)
+    output = request.get('output')
+    if not output:
+        base_name = os.path.splitext(os.path.basename(request['cover']))[0]
+        output = os.path.join(spool, f"{base_name}_concealed{output_extension(output_format)}")
+    save_image(image, output, output_format)
+    return {'output': output, 'bytes': os.path.getsize(output), 'stream': not request.get('output')}
+
+
+def reveal_job(job_id, request, spool):
+    """Run a reveal request in a worker and return its result record
+
+    'images' reveals a set made by splitting one file; 'image' reveals one,
+    and with 'legacy' it may be an unencrypted image from the first version.
+    The file goes to 'output' (a file or a directory), or into spool to be
+    streamed back when no output is given.
+    """
+    output = request.get('output') or spool
+    options = {'key': request.get('key'), 'workers': 1, 'progress': _job_meter(job_id), 'key_cache': _key_cache,
+               'max_kdf_cost': request.get('max_kdf_cost')}
+    if 'images' in request:
+        output = reveal_split_to_file(request['images'], output, **options)
+    else:
+        output = reveal_to_file(request['image'], output, legacy=request.get('legacy', False), **options)
+    return {'output': output, 'bytes': os.path.getsize(output), 'stream': not request.get('output')}
+
+
+class ConcealerService:
+    """Serves conceal and reveal requests from local clients on a pool of warm worker processes
+
+    Each connection sends one JSON request line and gets JSON event lines
+    back: progress events while the job runs, a 'file' event followed by the
+    raw bytes when the result is streamed, and finally 'done' or 'error'.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, key_cache_size=64, spool_dir=None, max_kdf_cost=None):
+        self.workers = workers
+        self.key_cache_size = key_cache_size
+        self.spool_dir = spool_dir
+        self.max_kdf_cost = max_kdf_cost
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.pool = None
+        self.server = None
+        self.started = time.time()
+        self.served = 0
+        self.path = None
+        self.token = None
+        self.token_file = None
+
+    async def start(self, path=None, port=None, token_file=None):
+        """Start the worker pool and listen on a Unix socket path or a localhost port
+
+        On a port, every request must carry the token written to token_file.
+        """
+        loop = asyncio.get_running_loop()
+        self.loop = loop
+        self.spool = tempfile.mkdtemp(prefix='concealer-', dir=self.spool_dir)
+        self.events = multiprocessing.get_context().Queue()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.events, self.key_cache_size))
+        self.reader = threading.Thread(target=self._read_events, daemon=True)
+        self.reader.start()
+
+        # Start every worker now so imports and crypto setup are paid before the first request
+        await asyncio.gather(*[loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)])
+
+        if port is None:
+            if os.path.exists(path):
+                if _socket_in_use(path):
+                    raise ConcealerError(f"Another service is already listening on {path}!")
+                os.remove(path)
+            # Bound with owner-only permissions, so there is no moment when other users can connect
+            umask = os.umask(0o177)
+            try:
+                self.server = await asyncio.start_unix_server(self.handle, path, limit=MAX_REQUEST_SIZE)
+            finally:
+                os.umask(umask)
+            self.path = path
+        else:
+            # Written once the port is ours, so a failed start leaves a running service's token alone
+            self.token = secrets.token_hex(32)
+            self.server = await asyncio.start_server(self.handle, '127.0.0.1', port, limit=MAX_REQUEST_SIZE)
+            _write_token(token_file or DEFAULT_TOKEN_FILE, self.token)
+            self.token_file = token_file or DEFAULT_TOKEN_FILE
+
+    def _read_events(self):
+        """Hand progress events from the workers to the connections waiting on them"""
+        while True:
+            item = self.events.get()
+            if item is None:
+                return
+            self.loop.call_soon_threadsafe(self._dispatch, *item)
+
+    def _dispatch(self, job_id, event):
+        queue = self.jobs.get(job_id)
+        if queue is not None:
+            queue.put_nowait(event)
+
+    async def handle(self, reader, writer):
+        """Serve one request on a client connection"""
+        job_id = spool = future = None
+        try:
+            try:
+                request = json.loads(await reader.readline())
+            except (ValueError, asyncio.LimitOverrunError):
+                raise ConcealerError("The request is not a JSON line!")
+            if self.token is not None:
+                token = request.pop('token', None) if isinstance(request, dict) else None
+                if not isinstance(token, str) or not hmac.compare_digest(token, self.token):
+                    raise ConcealerError("The request does not carry the service token!")
+            check_request(request)
+            # The service's limit applies whatever the client asks for
+            request['max_kdf_cost'] = self.max_kdf_cost
+
+            if request['op'] == 'ping':
+                await self._send(writer, {'event': 'done', 'ok': True, 'pid': os.getpid(), 'workers': self.workers,
+                                          'served': self.served, 'uptime': round(time.time() - self.started, 1)})
+                return
+
+            job_id = next(self.job_ids)
+            self.jobs[job_id] = events = asyncio.Queue()
+            spool = tempfile.mkdtemp(dir=self.spool)
+            worker = conceal_job if request['op'] == 'conceal' else reveal_job
+            future = self.loop.run_in_executor(self.pool, worker, job_id, request, spool)
+
+            # Relay progress until the job finishes
+            while not future.done():
+                waiting = asyncio.ensure_future(events.get())
+                await asyncio.wait({waiting, future}, return_when=asyncio.FIRST_COMPLETED)
+                if waiting.done():
+                    await self._send(writer, waiting.result())
+                else:
+                    waiting.cancel()
+            result = future.result()
+
+            if result.pop('stream', False):
+                await self._stream(writer, result.pop('output'))
+            self.served += 1
+            await self._send(writer, dict(result, event='done', ok=True))
+        except ConcealerError as e:
+            await self._send_error(writer, str(e))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await self._send_error(writer, f"Error handling request: {str(e)}")
+        finally:
+            self.jobs.pop(job_id, None)
+            if spool is not None:
+                if future is None or future.done():
+                    shutil.rmtree(spool, ignore_errors=True)
+                else:
+                    # The client went away mid-job; clean up once the worker is done with the files
+                    future.add_done_callback(lambda done: _discard(done, spool))
+            writer.close()
+
+    async def _send(self, writer, event):
+        writer.write(json.dumps(event).encode() + b'\n')
+        await writer.drain()
+
+    async def _send_error(self, writer, message):
+        try:
+            await self._send(writer, {'event': 'error', 'ok': False, 'error': message})
+        except ConnectionError:
+            pass
+
+    async def _stream(self, writer, path):
+        """Send a result file as a 'file' event followed by its bytes"""
+        size = os.path.getsize(path)
+        await self._send(writer, {'event': 'file', 'name': os.path.basename(path), 'size': size})
+        with open(path, 'rb') as f:
+            while True:
+                data = await self.loop.run_in_executor(None, f.read, STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+
+    async def close(self):
+        """Stop listening, finish running jobs and remove the socket and spool"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            if self.token_file and os.path.exists(self.token_file):
+                os.remove(self.token_file)
+        if self.pool is not None:
+            await self.loop.run_in_executor(None, self.pool.shutdown)
+            self.events.put(None)
+            self.reader.join()
+            shutil.rmtree(self.spool, ignore_errors=True)
+
+
+def _discard(future, spool):
+    """Drop the result of a job nobody is waiting for and remove its spool directory"""
+    if not future.cancelled():
+        future.exception()
+    shutil.rmtree(spool, ignore_errors=True)
+
+
+def _write_token(path, token):
+    """Write token to path, readable only by this user"""
+    if os.path.exists(path):
+        os.remove(path)
+    # O_EXCL so a file someone else slipped in between is not written to
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(token + '\n')
+    except OSError as e:
+        raise ConcealerError(f"Cannot write the service token to {path}: {str(e)}")
+
+
+def _socket_in_use(path):
+    """Whether something is accepting connections on the Unix socket at path"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+async def serve(args):
+    service = ConcealerService(max(1, args.workers), args.key_cache, args.spool, args.max_kdf_cost)
+    try:
+        await service.start(args.socket, args.port, args.token_file)
+        where = args.socket if args.port is None else f"127.0.0.1:{args.port} (token in {service.token_file})"
+        print(f"✅ Service listening on {where} with {service.workers} worker(s)", flush=True)
+
+        stop = asyncio.Event()
+        if os.name != 'nt':
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                service.loop.add_signal_handler(signum, stop.set)
+        await stop.wait()
+    finally:
+        await service.close()
+    print(f"Service stopped after {service.served} request(s)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve conceal/reveal requests to local clients "
+                                                 "from warm worker processes")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument('--socket', help=f"Unix socket to listen on (default: {DEFAULT_SOCKET})")
+    where.add_argument('--port', type=int, help="Listen on this localhost TCP port instead of a Unix socket")
+    parser.add_argument('--token-file',
+                        help=f"Where to write the token TCP clients must send (default: {DEFAULT_TOKEN_FILE})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Number of worker processes (default: one per CPU)")
+    parser.add_argument('--key-cache', type=int, default=64,
+                        help="Derived keys each worker keeps between requests (default: 64, 0 to keep none)")
+    parser.add_argument('--spool', help="Directory for results waiting to be streamed back (default: system temp)")
+    parser.add_argument('--max-kdf-cost', type=int,
+                        help="Refuse images whose key derivation takes more than this many PBKDF2 iterations "
+                             "or scrypt N*r*p")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.port is None and args.socket is None:
+        if hasattr(socket, 'AF_UNIX') and os.name != 'nt':
+            args.socket = DEFAULT_SOCKET
+        else:
+            args.port = DEFAULT_PORT
+    try:
+        asyncio.run(serve(args))
+    except (ConcealerError, OSError) as e:
+        print(f"❌ {str(e)}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,108 +1,140 @@
 import sys
 import os
-import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, 
                              QLabel, QPushButton, QGridLayout, QFrame, 
                              QMessageBox, QGroupBox, QTextEdit, QLineEdit,
-                             QFileDialog, QTabWidget, QProgressBar)
+                             QFileDialog, QTabWidget, QProgressBar, QComboBox,
+                             QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+                             QCheckBox)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont
-from PIL import Image
-import numpy as np
+from concealer_core import (ConcealerError, CancelToken, DEFAULT_WORKERS, COMPRESSION_NONE, COMPRESSION_ZLIB,
+                            COMPRESSION_LZMA, COMPRESSION_BZ2, DEFAULT_OUTPUT_FORMAT, ProgressMeter, check_capacity,
+                            estimate_payload, conceal_image, conceal_split, reveal_to_file, reveal_split_to_file,
+                            save_image, output_extension)
+
+# Several selected images are shown in one path field, separated by this
+PATH_SEPARATOR = "; "
+
+# Dropped files with these extensions are queued for revealing
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+# States of a queued job, as shown in the queue table
+JOB_QUEUED = "Queued"
+JOB_RUNNING = "Running"
+JOB_DONE = "Done"
+JOB_FAILED = "Failed"
+JOB_CANCELLED = "Cancelled"
+
+
+# Output formats offered in the window, fastest first
+OUTPUT_FORMAT_CHOICES = [
+    ("PNG (fast)", 'png-fast'),
+    ("PNG (balanced)", 'png'),
+    ("PNG (smallest, slow)", 'png-small'),
+    ("WebP lossless", 'webp'),
+    ("TIFF (LZW)", 'tiff-lzw'),
+    ("TIFF (uncompressed)", 'tiff'),
+    ("BMP", 'bmp'),
+]
+
+
+def split_paths(text):
+    """Return the image paths listed in a path field"""
+    return [path for path in text.split(PATH_SEPARATOR) if path]
+
+
+def format_size(size):
+    """Format a byte count for display"""
+    for unit in ('bytes', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'bytes' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_duration(seconds):
+    """Format a number of seconds left for display"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    return f"{seconds // 60}:{seconds % 60:02d} min"
 
 
 class ConcealThread(QThread):
     """Thread for concealing files to avoid UI freezing"""
     progress = pyqtSignal(int)
     status = pyqtSignal(str)
+    rate = pyqtSignal(float, float)
     finished_signal = pyqtSignal(bool, str)
     
-    def __init__(self, file_path, image_path, key, output_dir):
+    def __init__(self, file_path, image_path, key, output_dir, bits_per_channel=1,
+                 workers=DEFAULT_WORKERS, compression=COMPRESSION_NONE, output_format=DEFAULT_OUTPUT_FORMAT):
         super().__init__()
         self.file_path = file_path
         self.image_path = image_path
         self.key = key
         self.output_dir = output_dir
+        self.bits_per_channel = bits_per_channel
+        self.workers = workers
+        self.compression = compression
+        self.output_format = output_format
+        self.meter = ProgressMeter(self.report, self.tick)
+        self.cancel = CancelToken()
+    
+    def report(self, percent, message):
+        """Forward engine progress to the UI signals"""
+        self.status.emit(message)
+        self.progress.emit(percent)
+    
+    def tick(self, percent, rate, eta):
+        """Forward throttled byte progress, with the rate and time left, to the UI signals"""
+        self.progress.emit(percent)
+        self.rate.emit(rate, -1.0 if eta is None else eta)
+    
+    def output_path(self, image_path):
+        """Output file for one cover, named after the cover and the payload like the command line does"""
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        payload_name = os.path.splitext(os.path.basename(self.file_path))[0]
+        extension = output_extension(self.output_format)
+        return os.path.join(self.output_dir, f"{base_name}_{payload_name}_concealed{extension}")
+    
+    def output_paths(self):
+        """Every file this job writes"""
+        images = self.image_path if isinstance(self.image_path, list) else [self.image_path]
+        return [os.path.normcase(os.path.abspath(self.output_path(path))) for path in images]
+    
+    def run_split(self):
+        """Spread the file across every selected cover image"""
+        outputs = [self.output_path(path) for path in self.image_path]
+        used = conceal_split(self.file_path, self.image_path, outputs, self.key, self.bits_per_channel,
+                             self.workers, self.meter, compression=self.compression,
+                             output_format=self.output_format, cancel=self.cancel)
+        self.finished_signal.emit(True, f"File concealed across {len(used)} image(s)!\n"
+                                        f"Output: {', '.join(os.path.basename(path) for path in used)}\n"
+                                        f"Folder: {self.output_dir}")
     
     def run(self):
         try:
-            self.status.emit("🔄 Reading input file...")
-            self.progress.emit(10)
-            
-            # Read the file to be concealed
-            with open(self.file_path, 'rb') as f:
-                file_data = f.read()
-            
-            self.status.emit("🔐 Encrypting file data...")
-            self.progress.emit(25)
-            
-            # Encrypt the file data if key is provided
-            if self.key:
-                # Generate a key from the password
-                salt = os.urandom(16)
-                kdf = PBKDF2HMAC(
-                    algorithm=hashes.SHA256(),
-                    length=32,
-                    salt=salt,
-                    iterations=100000,
-                )
-                key = base64.urlsafe_b64encode(kdf.derive(self.key.encode()))
-                f = Fernet(key)
-                file_data = salt + f.encrypt(file_data)
-            
-            self.status.emit("📷 Loading cover image...")
-            self.progress.emit(40)
-            
-            # Load the cover image
-            img = Image.open(self.image_path).convert('RGB')
-            img_array = np.array(img)
-            
-            # Convert file data to binary string
-            file_data_bits = ''.join(format(byte, '08b') for byte in file_data)
-            
-            # Add a delimiter to mark the end of the hidden data
-            delimiter = '1111111111111110'  # 16-bit delimiter
-            file_data_bits += delimiter
-            
-            self.status.emit("🔄 Concealing data in image...")
-            self.progress.emit(60)
-            
-            # Check if the image can hold the data
-            total_pixels = img_array.shape[0] * img_array.shape[1] * img_array.shape[2]
-            if len(file_data_bits) > total_pixels:
-                self.finished_signal.emit(False, "Image is too small to hold the file data!")
+            if isinstance(self.image_path, list):
+                self.run_split()
                 return
             
-            # Hide the data in the least significant bits
-            flat_img = img_array.flatten()
-            data_index = 0
-            
-            for i in range(len(file_data_bits)):
-                if data_index < len(flat_img):
-                    # Modify the least significant bit
-                    flat_img[data_index] = (flat_img[data_index] & 0xFE) | int(file_data_bits[i])
-                    data_index += 1
+            concealed_img = conceal_image(self.file_path, self.image_path, self.key,
+                                          self.bits_per_channel, self.workers, self.meter,
+                                          compression=self.compression, cancel=self.cancel)
             
-            self.status.emit("💾 Saving concealed image...")
-            self.progress.emit(80)
+            self.report(80, "💾 Saving concealed image...")
             
-            # Reshape and save the image
-            concealed_img_array = flat_img.reshape(img_array.shape)
-            concealed_img = Image.fromarray(concealed_img_array.astype('uint8'))
+            output_path = self.output_path(self.image_path)
             
-            # Generate output filename
-            base_name = os.path.splitext(os.path.basename(self.image_path))[0]
-            output_path = os.path.join(self.output_dir, f"{base_name}_concealed.png")
+            save_image(concealed_img, output_path, self.output_format, self.cancel)
             
-            concealed_img.save(output_path, 'PNG')
-            
-            self.progress.emit(100)
-            self.status.emit("✅ File concealed successfully!")
+            self.report(100, "✅ File concealed successfully!")
             self.finished_signal.emit(True, f"File concealed successfully!\nOutput: {output_path}")
             
+        except ConcealerError as e:
+            self.finished_signal.emit(False, str(e))
         except Exception as e:
             self.finished_signal.emit(False, f"Error concealing file: {str(e)}")
 
@@ -111,111 +143,48 @@ class RevealThread(QThread):
     """Thread for revealing files to avoid UI freezing"""
     progress = pyqtSignal(int)
     status = pyqtSignal(str)
+    rate = pyqtSignal(float, float)
     finished_signal = pyqtSignal(bool, str)
     
-    def __init__(self, image_path, key, output_dir):
+    def __init__(self, image_path, key, output_dir, workers=DEFAULT_WORKERS, legacy=False):
         super().__init__()
         self.image_path = image_path
         self.key = key
         self.output_dir = output_dir
+        self.workers = workers
+        self.legacy = legacy
+        self.meter = ProgressMeter(self.report, self.tick)
+        self.cancel = CancelToken()
+    
+    def report(self, percent, message):
+        """Forward engine progress to the UI signals"""
+        # The engine's completion message is sent once the file is written
+        if percent < 100:
+            self.status.emit(message)
+            self.progress.emit(percent)
+    
+    def tick(self, percent, rate, eta):
+        """Forward throttled byte progress, with the rate and time left, to the UI signals"""
+        self.progress.emit(percent)
+        self.rate.emit(rate, -1.0 if eta is None else eta)
     
     def run(self):
         try:
-            self.status.emit("📷 Loading concealed image...")
-            self.progress.emit(10)
-            
-            # Load the concealed image
-            img = Image.open(self.image_path).convert('RGB')
-            img_array = np.array(img)
-            flat_img = img_array.flatten()
-            
-            self.status.emit("🔍 Extracting hidden data...")
-            self.progress.emit(30)
-            
-            # Extract bits from the least significant bits
-            binary_data = ''
-            delimiter = '1111111111111110'  # 16-bit delimiter
-            
-            for pixel_value in flat_img:
-                binary_data += str(pixel_value & 1)
-                
-                # Check for delimiter
-                if binary_data.endswith(delimiter):
-                    # Remove delimiter from the end
-                    binary_data = binary_data[:-len(delimiter)]
-                    break
-            
-            if not binary_data.endswith(delimiter.replace(delimiter, '')) and not binary_data:
-                self.finished_signal.emit(False, "No hidden data found in the image!")
-                return
-            
-            self.status.emit("🔄 Converting binary data...")
-            self.progress.emit(50)
-            
-            # Convert binary string back to bytes
-            # Ensure the binary string length is a multiple of 8
-            if len(binary_data) % 8 != 0:
-                binary_data = binary_data[:-(len(binary_data) % 8)]
-            
-            file_data = bytearray()
-            for i in range(0, len(binary_data), 8):
-                byte = binary_data[i:i+8]
-                if len(byte) == 8:
-                    file_data.append(int(byte, 2))
-            
-            file_data = bytes(file_data)
-            
-            self.status.emit("🔐 Decrypting file data...")
-            self.progress.emit(70)
-            
-            # Decrypt the file data if key is provided
-            if self.key:
-                try:
-                    # Extract salt and encrypted data
-                    salt = file_data[:16]
-                    encrypted_data = file_data[16:]
-                    
-                    # Generate key from password
-                    kdf = PBKDF2HMAC(
-                        algorithm=hashes.SHA256(),
-                        length=32,
-                        salt=salt,
-                        iterations=100000,
-                    )
-                    key = base64.urlsafe_b64encode(kdf.derive(self.key.encode()))
-                    f = Fernet(key)
-                    file_data = f.decrypt(encrypted_data)
-                except Exception as e:
-                    self.finished_signal.emit(False, "Incorrect key/password or corrupted data!")
-                    return
-            
-            self.status.emit("💾 Saving revealed file...")
-            self.progress.emit(90)
-            
-            # Save the revealed file
-            base_name = os.path.splitext(os.path.basename(self.image_path))[0]
-            output_path = os.path.join(self.output_dir, f"{base_name}_revealed.bin")
-            
-            # Try to determine the original file extension from the file data
-            # Check for common file signatures
-            if file_data.startswith(b'PK'):  # ZIP file
-                output_path = output_path.replace('.bin', '.zip')
-            elif file_data.startswith(b'\x89PNG'):  # PNG file
-                output_path = output_path.replace('.bin', '.png')
-            elif file_data.startswith(b'\xff\xd8\xff'):  # JPEG file
-                output_path = output_path.replace('.bin', '.jpg')
-            elif file_data.startswith(b'%PDF'):  # PDF file
-                output_path = output_path.replace('.bin', '.pdf')
-            elif file_data.startswith(b'\x50\x4b\x03\x04'):  # Another ZIP signature
-                output_path = output_path.replace('.bin', '.zip')
-            
-            with open(output_path, 'wb') as f:
-                f.write(file_data)
+            # The file is written as it is extracted and named with the extension
+            # guessed from its signature; a set is named after its first image
+            if isinstance(self.image_path, list):
+                output_path = reveal_split_to_file(self.image_path, self.output_dir, self.key, self.workers,
+                                                   self.meter, cancel=self.cancel)
+            else:
+                output_path = reveal_to_file(self.image_path, self.output_dir, self.key, self.workers,
+                                             self.meter, cancel=self.cancel, legacy=self.legacy)
             
             self.progress.emit(100)
             self.status.emit("✅ File revealed successfully!")
             self.finished_signal.emit(True, f"File revealed successfully!\nOutput: {output_path}")
             
+        except ConcealerError as e:
+            self.finished_signal.emit(False, str(e))
         except Exception as e:
             self.finished_signal.emit(False, f"Error revealing file: {str(e)}")
 
@@ -224,15 +193,18 @@ class FileConcealer(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent_window = parent
-        self.conceal_thread = None
-        self.reveal_thread = None
+        self.jobs = []  # queued, running and finished jobs, in table order
+        self.batch = []  # jobs added since the queue was last idle
+        self.job_count = 0
+        self.capacity_keyed = False  # whether the capacity shown was checked with a key
         self.init_ui()
+        self.setAcceptDrops(True)
     
     def init_ui(self):
         # Set window properties
         self.setWindowTitle("File Concealer - Utility Tools")
-        self.setGeometry(150, 150, 900, 960)
-        self.setFixedSize(900, 960)
+        self.setGeometry(150, 150, 900, 990)
+        self.setFixedSize(900, 990)
         
         # Create central widget and main layout
         central_widget = QWidget()
@@ -308,6 +280,10 @@ class FileConcealer(QMainWindow):
         self.reveal_tab = self.create_reveal_tab()
         self.tab_widget.addTab(self.reveal_tab, "🔓 Reveal File")
         
+        # Create queue tab
+        self.queue_tab = self.create_queue_tab()
+        self.tab_widget.addTab(self.queue_tab, "📋 Queue")
+        
         # Status area
         status_frame = QGroupBox("Status")
         status_frame.setFont(QFont("Arial", 8, QFont.Bold))
@@ -359,8 +335,35 @@ class FileConcealer(QMainWindow):
             }
         """)
         
+        # Stops every queued and running job, running ones at their next chunk
+        self.cancel_btn = QPushButton("Cancel All")
+        self.cancel_btn.setVisible(False)
+        self.cancel_btn.setFont(QFont("Arial", 8, QFont.Bold))
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #e74c3c;
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 4px 12px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #c0392b;
+            }
+            QPushButton:disabled {
+                background-color: #bdc3c7;
+                color: #7f8c8d;
+            }
+        """)
+        self.cancel_btn.clicked.connect(self.cancel_all)
+        
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.cancel_btn)
+        
         status_layout.addWidget(self.status_text)
-        status_layout.addWidget(self.progress_bar)
+        status_layout.addLayout(progress_layout)
         
         # Back button
         self.back_btn = QPushButton("Back to Main Menu")
@@ -450,7 +453,7 @@ class FileConcealer(QMainWindow):
         
         image_selection_layout = QHBoxLayout()
         self.conceal_image_path = QLineEdit()
-        self.conceal_image_path.setPlaceholderText("Select an image to hide the file in")
+        self.conceal_image_path.setPlaceholderText("Select an image to hide the file in, or several to split it")
         self.conceal_image_path.setReadOnly(True)
         self.conceal_image_path.setStyleSheet("""
             QLineEdit {
@@ -503,8 +506,55 @@ class FileConcealer(QMainWindow):
         
         key_layout.addWidget(self.conceal_key)
         
+        # Embedding options
+        options_group = QGroupBox("4. Embedding Options")
+        options_group.setFont(QFont("Arial", 8, QFont.Bold))
+        options_layout = QHBoxLayout(options_group)
+        
+        bits_label = QLabel("Bits per channel:")
+        self.conceal_bits_per_channel = QComboBox()
+        self.conceal_bits_per_channel.addItem("1 bit (best quality)", 1)
+        self.conceal_bits_per_channel.addItem("2 bits (2x capacity)", 2)
+        self.conceal_bits_per_channel.addItem("3 bits (3x capacity)", 3)
+        self.conceal_bits_per_channel.addItem("4 bits (4x capacity)", 4)
+        self.conceal_bits_per_channel.setToolTip(
+            "More bits per channel hide larger files in smaller images, at the cost of image quality")
+        self.conceal_bits_per_channel.setStyleSheet("""
+            QComboBox {
+                padding: 6px;
+                border: 2px solid #bdc3c7;
+                border-radius: 5px;
+            }
+        """)
+        
+        compression_label = QLabel("Compression:")
+        self.conceal_compression = QComboBox()
+        self.conceal_compression.addItem("zlib (fast)", COMPRESSION_ZLIB)
+        self.conceal_compression.addItem("LZMA (smallest)", COMPRESSION_LZMA)
+        self.conceal_compression.addItem("bzip2", COMPRESSION_BZ2)
+        self.conceal_compression.addItem("None", COMPRESSION_NONE)
+        self.conceal_compression.setToolTip(
+            "Compress the file before hiding it; skipped automatically for ZIP, JPEG, PNG and other compressed files")
+        self.conceal_compression.setStyleSheet(self.conceal_bits_per_channel.styleSheet())
+        
+        options_layout.addWidget(bits_label)
+        options_layout.addWidget(self.conceal_bits_per_channel, 1)
+        options_layout.addWidget(compression_label)
+        options_layout.addWidget(self.conceal_compression, 1)
+        
+        # Capacity preflight, updated whenever the file, cover or options change
+        self.conceal_capacity_label = QLabel("Select a file and a cover image to check capacity")
+        self.conceal_capacity_label.setAlignment(Qt.AlignCenter)
+        self.conceal_capacity_label.setStyleSheet("QLabel { color: #7f8c8d; }")
+        
+        self.conceal_file_path.textChanged.connect(self.update_capacity)
+        self.conceal_image_path.textChanged.connect(self.update_capacity)
+        self.conceal_key.textChanged.connect(self.conceal_key_changed)
+        self.conceal_bits_per_channel.currentIndexChanged.connect(self.update_capacity)
+        self.conceal_compression.currentIndexChanged.connect(self.update_capacity)
+        
         # Output directory
-        output_group = QGroupBox("4. Output Directory")
+        output_group = QGroupBox("5. Output Directory and Format")
         output_group.setFont(QFont("Arial", 8, QFont.Bold))
         output_layout = QVBoxLayout(output_group)
         
@@ -538,7 +588,15 @@ class FileConcealer(QMainWindow):
         """)
         self.browse_output_btn.clicked.connect(self.browse_conceal_output)
         
+        self.conceal_output_format = QComboBox()
+        for label, output_format in OUTPUT_FORMAT_CHOICES:
+            self.conceal_output_format.addItem(label, output_format)
+        self.conceal_output_format.setToolTip(
+            "Lossless format of the concealed image; PNG (fast) saves quickly, the slower options make smaller files")
+        self.conceal_output_format.setStyleSheet(self.conceal_bits_per_channel.styleSheet())
+        
         output_selection_layout.addWidget(self.conceal_output_path)
+        output_selection_layout.addWidget(self.conceal_output_format)
         output_selection_layout.addWidget(self.browse_output_btn)
         output_layout.addLayout(output_selection_layout)
         
@@ -572,8 +630,10 @@ class FileConcealer(QMainWindow):
         layout.addWidget(file_group)
         layout.addWidget(image_group)
         layout.addWidget(key_group)
+        layout.addWidget(options_group)
         layout.addWidget(output_group)
         layout.addStretch()
+        layout.addWidget(self.conceal_capacity_label)
         layout.addWidget(self.conceal_btn)
         
         return tab
@@ -591,7 +651,7 @@ class FileConcealer(QMainWindow):
         
         image_selection_layout = QHBoxLayout()
         self.reveal_image_path = QLineEdit()
-        self.reveal_image_path.setPlaceholderText("Select image containing hidden file")
+        self.reveal_image_path.setPlaceholderText("Select image containing hidden file (all images of a split set)")
         self.reveal_image_path.setReadOnly(True)
         self.reveal_image_path.setStyleSheet("""
             QLineEdit {
@@ -644,6 +704,11 @@ class FileConcealer(QMainWindow):
         
         key_layout.addWidget(self.reveal_key)
         
+        # Unencrypted images from the first version only end with a marker,
+        # which noise in any photo can mimic, so they are read on request
+        self.reveal_legacy = QCheckBox("Image was concealed without a password by an old version")
+        key_layout.addWidget(self.reveal_legacy)
+        
         # Output directory
         output_group = QGroupBox("3. Output Directory")
         output_group.setFont(QFont("Arial", 8, QFont.Bold))
@@ -718,6 +783,106 @@ class FileConcealer(QMainWindow):
         
         return tab
     
+    def create_queue_tab(self):
+        """Create the job queue tab widget"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.setSpacing(15)
+        
+        hint_label = QLabel("Drop files on the Conceal tab to hide each one in the selected cover image, "
+                            "or on the Reveal or Queue tab to reveal them.")
+        hint_label.setWordWrap(True)
+        hint_label.setStyleSheet("QLabel { color: #7f8c8d; }")
+        
+        # One row per job, in the order they were added
+        self.queue_table = QTableWidget(0, 5)
+        self.queue_table.setHorizontalHeaderLabels(["#", "Job", "Status", "Progress", "Speed"])
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        header = self.queue_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.Stretch)
+        header.setSectionResizeMode(3, QHeaderView.Fixed)
+        self.queue_table.setColumnWidth(3, 150)
+        self.queue_table.setStyleSheet("""
+            QTableWidget {
+                border: 2px solid #bdc3c7;
+                border-radius: 5px;
+                gridline-color: #ecf0f1;
+            }
+            QTableWidget::item:selected {
+                background-color: #d7bde2;
+                color: #2c3e50;
+            }
+        """)
+        
+        controls_layout = QHBoxLayout()
+        max_jobs_label = QLabel("Parallel jobs:")
+        self.max_jobs = QSpinBox()
+        self.max_jobs.setRange(1, max(4, DEFAULT_WORKERS))
+        self.max_jobs.setValue(2)
+        self.max_jobs.setToolTip("How many jobs run at the same time; they share the CPU cores")
+        self.max_jobs.setStyleSheet("""
+            QSpinBox {
+                padding: 5px;
+                border: 2px solid #bdc3c7;
+                border-radius: 5px;
+                background-color: white;
+            }
+            QSpinBox:focus {
+                border-color: #9b59b6;
+            }
+        """)
+        self.max_jobs.valueChanged.connect(self.start_jobs)
+        
+        self.cancel_selected_btn = QPushButton("Cancel Selected")
+        self.cancel_selected_btn.setMinimumHeight(35)
+        self.cancel_selected_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #e74c3c;
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 8px 15px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #c0392b;
+            }
+        """)
+        self.cancel_selected_btn.clicked.connect(self.cancel_selected)
+        
+        self.clear_finished_btn = QPushButton("Clear Finished")
+        self.clear_finished_btn.setMinimumHeight(35)
+        self.clear_finished_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #95a5a6;
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 8px 15px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #7f8c8d;
+            }
+        """)
+        self.clear_finished_btn.clicked.connect(self.clear_finished)
+        
+        controls_layout.addWidget(max_jobs_label)
+        controls_layout.addWidget(self.max_jobs)
+        controls_layout.addStretch()
+        controls_layout.addWidget(self.cancel_selected_btn)
+        controls_layout.addWidget(self.clear_finished_btn)
+        
+        # Add widgets to layout
+        layout.addWidget(hint_label)
+        layout.addWidget(self.queue_table, 1)
+        layout.addLayout(controls_layout)
+        
+        return tab
+    
     def browse_conceal_file(self):
         """Browse for file to conceal"""
         file_path, _ = QFileDialog.getOpenFileName(
@@ -731,16 +896,60 @@ class FileConcealer(QMainWindow):
             self.status_text.append(f"📁 Selected file: {os.path.basename(file_path)}")
     
     def browse_conceal_image(self):
-        """Browse for cover image"""
-        image_path, _ = QFileDialog.getOpenFileName(
+        """Browse for cover images; selecting several splits the file across them"""
+        image_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select Cover Image",
+            "Select Cover Image(s)",
             "",
-            "Image Files (*.png *.jpg *.jpeg *.bmp *.tiff);;PNG Files (*.png);;JPEG Files (*.jpg *.jpeg)"
+            "Image Files (*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.webp);;PNG Files (*.png);;JPEG Files (*.jpg *.jpeg)"
         )
-        if image_path:
-            self.conceal_image_path.setText(image_path)
-            self.status_text.append(f"🖼️ Selected image: {os.path.basename(image_path)}")
+        if image_paths:
+            self.conceal_image_path.setText(PATH_SEPARATOR.join(image_paths))
+            if len(image_paths) == 1:
+                self.status_text.append(f"🖼️ Selected image: {os.path.basename(image_paths[0])}")
+            else:
+                self.status_text.append(f"🖼️ Selected {len(image_paths)} images, the file will be split across them")
+    
+    def conceal_key_changed(self, key):
+        """Recheck capacity when the key is set or cleared; its length makes no difference"""
+        if bool(key) != self.capacity_keyed:
+            self.update_capacity()
+    
+    def update_capacity(self):
+        """Show whether the selected file fits in the selected cover image"""
+        self.capacity_keyed = bool(self.conceal_key.text())
+        file_path = self.conceal_file_path.text()
+        image_paths = split_paths(self.conceal_image_path.text())
+        if not file_path or not image_paths:
+            self.conceal_capacity_label.setText("Select a file and a cover image to check capacity")
+            self.conceal_capacity_label.setStyleSheet("QLabel { color: #7f8c8d; }")
+            return
+        
+        try:
+            # Reads only the image headers and the start of the file once, so it is instant
+            estimate = estimate_payload(file_path, self.conceal_compression.currentData())
+            reports = [check_capacity(file_path, image_path, self.conceal_key.text(),
+                                      self.conceal_bits_per_channel.currentData(), estimate=estimate)
+                       for image_path in image_paths]
+        except Exception as e:
+            self.conceal_capacity_label.setText(f"⚠️ Could not check capacity: {str(e)}")
+            self.conceal_capacity_label.setStyleSheet("QLabel { color: #e67e22; }")
+            return
+        
+        report = reports[0]
+        capacity = sum(other.capacity for other in reports)
+        images = f"this {report.width}x{report.height} image" if len(reports) == 1 else f"these {len(reports)} images"
+        needed = format_size(report.required)
+        if report.estimated:
+            needed = f"about {needed} after compression"
+        if report.required <= capacity:
+            self.conceal_capacity_label.setText(
+                f"✅ Fits: needs {needed} of {format_size(capacity)} available in {images}")
+            self.conceal_capacity_label.setStyleSheet("QLabel { color: #27ae60; }")
+        else:
+            self.conceal_capacity_label.setText(
+                f"❌ Doesn't fit: needs {needed}, but {images} hold only {format_size(capacity)}")
+            self.conceal_capacity_label.setStyleSheet("QLabel { color: #e74c3c; }")
     
     def browse_conceal_output(self):
         """Browse for output directory"""
@@ -753,16 +962,19 @@ class FileConcealer(QMainWindow):
             self.status_text.append(f"📂 Output directory: {output_dir}")
     
     def browse_reveal_image(self):
-        """Browse for concealed image"""
-        image_path, _ = QFileDialog.getOpenFileName(
+        """Browse for the concealed image, or every image of a split set"""
+        image_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select Concealed Image",
+            "Select Concealed Image(s)",
             "",
-            "Image Files (*.png *.jpg *.jpeg *.bmp *.tiff);;PNG Files (*.png);;JPEG Files (*.jpg *.jpeg)"
+            "Image Files (*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.webp);;PNG Files (*.png);;JPEG Files (*.jpg *.jpeg)"
         )
-        if image_path:
-            self.reveal_image_path.setText(image_path)
-            self.status_text.append(f"🖼️ Selected concealed image: {os.path.basename(image_path)}")
+        if image_paths:
+            self.reveal_image_path.setText(PATH_SEPARATOR.join(image_paths))
+            if len(image_paths) == 1:
+                self.status_text.append(f"🖼️ Selected concealed image: {os.path.basename(image_paths[0])}")
+            else:
+                self.status_text.append(f"🖼️ Selected a set of {len(image_paths)} concealed images")
     
     def browse_reveal_output(self):
         """Browse for reveal output directory"""
@@ -775,12 +987,15 @@ class FileConcealer(QMainWindow):
             self.status_text.append(f"📂 Output directory: {output_dir}")
     
     def conceal_file(self):
-        """Start the file concealing process"""
-        # Validate inputs
+        """Queue the selected file for concealing"""
         if not self.conceal_file_path.text():
             QMessageBox.warning(self, "Missing Input", "Please select a file to conceal.")
             return
-        
+        self.queue_conceal([self.conceal_file_path.text()])
+    
+    def queue_conceal(self, file_paths):
+        """Queue one conceal job per file, all using the cover and options of the Conceal tab"""
+        # Validate inputs
         if not self.conceal_image_path.text():
             QMessageBox.warning(self, "Missing Input", "Please select a cover image.")
             return
@@ -789,11 +1004,12 @@ class FileConcealer(QMainWindow):
             QMessageBox.warning(self, "Missing Input", "Please select an output directory.")
             return
         
-        if not os.path.exists(self.conceal_file_path.text()):
+        if not all(os.path.exists(file_path) for file_path in file_paths):
             QMessageBox.warning(self, "File Not Found", "The selected file does not exist.")
             return
         
-        if not os.path.exists(self.conceal_image_path.text()):
+        image_paths = split_paths(self.conceal_image_path.text())
+        if not all(os.path.exists(image_path) for image_path in image_paths):
             QMessageBox.warning(self, "Image Not Found", "The selected image does not exist.")
             return
         
@@ -801,47 +1017,51 @@ class FileConcealer(QMainWindow):
             QMessageBox.warning(self, "Directory Not Found", "The selected output directory does not exist.")
             return
         
-        # Disable UI during processing
-        self.conceal_btn.setEnabled(False)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        
-        # Start the concealing thread
-        self.conceal_thread = ConcealThread(
-            self.conceal_file_path.text(),
-            self.conceal_image_path.text(),
-            self.conceal_key.text(),
-            self.conceal_output_path.text()
-        )
-        
-        self.conceal_thread.progress.connect(self.progress_bar.setValue)
-        self.conceal_thread.status.connect(self.status_text.append)
-        self.conceal_thread.finished_signal.connect(self.conceal_finished)
-        
-        self.conceal_thread.start()
-    
-    def conceal_finished(self, success, message):
-        """Handle concealing completion"""
-        self.conceal_btn.setEnabled(True)
-        self.progress_bar.setVisible(False)
+        covers = os.path.basename(image_paths[0]) if len(image_paths) == 1 else f"{len(image_paths)} images"
+        jobs = []
+        for file_path in file_paths:
+            jobs.append(ConcealThread(
+                file_path,
+                image_paths if len(image_paths) > 1 else image_paths[0],
+                self.conceal_key.text(),
+                self.conceal_output_path.text(),
+                self.conceal_bits_per_channel.currentData(),
+                compression=self.conceal_compression.currentData(),
+                output_format=self.conceal_output_format.currentData()
+            ))
+        
+        # Two jobs writing the same file would overwrite each other's output
+        outputs = [path for job in self.jobs if isinstance(job, ConcealThread)
+                   and job.state in (JOB_QUEUED, JOB_RUNNING) for path in job.output_paths()]
+        for job in jobs:
+            clashes = [path for path in job.output_paths() if path in outputs]
+            if clashes:
+                QMessageBox.warning(self, "Output In Use",
+                                    f"Another queued job already writes {os.path.basename(clashes[0])}.\n"
+                                    f"Wait for it to finish, rename the file or choose another output directory.")
+                return
+            outputs.extend(job.output_paths())
         
-        if success:
-            QMessageBox.information(self, "Success", message)
-        else:
-            QMessageBox.critical(self, "Error", message)
+        for job in jobs:
+            self.enqueue(job, f"🔒 {os.path.basename(job.file_path)} → {covers}")
     
     def reveal_file(self):
-        """Start the file revealing process"""
-        # Validate inputs
+        """Queue the selected image, or split set, for revealing"""
         if not self.reveal_image_path.text():
             QMessageBox.warning(self, "Missing Input", "Please select a concealed image.")
             return
-        
+        image_paths = split_paths(self.reveal_image_path.text())
+        self.queue_reveal([image_paths if len(image_paths) > 1 else image_paths[0]])
+    
+    def queue_reveal(self, images):
+        """Queue one reveal job per image or split set, using the key and output directory of the Reveal tab"""
+        # Validate inputs
         if not self.reveal_output_path.text():
             QMessageBox.warning(self, "Missing Input", "Please select an output directory.")
             return
         
-        if not os.path.exists(self.reveal_image_path.text()):
+        paths = [path for image in images for path in (image if isinstance(image, list) else [image])]
+        if not all(os.path.exists(path) for path in paths):
             QMessageBox.warning(self, "Image Not Found", "The selected image does not exist.")
             return
         
@@ -849,41 +1069,241 @@ class FileConcealer(QMainWindow):
             QMessageBox.warning(self, "Directory Not Found", "The selected output directory does not exist.")
             return
         
-        # Disable UI during processing
-        self.reveal_btn.setEnabled(False)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        
-        # Start the revealing thread
-        self.reveal_thread = RevealThread(
-            self.reveal_image_path.text(),
-            self.reveal_key.text(),
-            self.reveal_output_path.text()
-        )
-        
-        self.reveal_thread.progress.connect(self.progress_bar.setValue)
-        self.reveal_thread.status.connect(self.status_text.append)
-        self.reveal_thread.finished_signal.connect(self.reveal_finished)
-        
-        self.reveal_thread.start()
+        for image in images:
+            job = RevealThread(image, self.reveal_key.text(), self.reveal_output_path.text(),
+                               legacy=self.reveal_legacy.isChecked())
+            name = f"{len(image)} images" if isinstance(image, list) else os.path.basename(image)
+            self.enqueue(job, f"🔓 {name}")
     
-    def reveal_finished(self, success, message):
-        """Handle revealing completion"""
-        self.reveal_btn.setEnabled(True)
-        self.progress_bar.setVisible(False)
+    def enqueue(self, job, title):
+        """Add a job to the queue and start it as soon as a slot is free"""
+        self.job_count += 1
+        job.number = self.job_count
+        job.title = title
+        job.state = JOB_QUEUED
+        job.percent = 0
+        job.speed = 0.0
+        job.eta = -1.0
+        job.message = ""
+        
+        # Slots run on the window's thread, where sender() tells the jobs apart
+        job.progress.connect(self.job_progress)
+        job.status.connect(self.job_status)
+        job.rate.connect(self.job_rate)
+        job.finished_signal.connect(self.job_finished)
+        
+        self.jobs.append(job)
+        self.batch.append(job)
+        self.add_job_row(job)
+        self.status_text.append(f"[{job.number}] 📋 Queued: {title}")
+        self.start_jobs()
+    
+    def start_jobs(self):
+        """Start queued jobs in order until the parallel job limit is reached"""
+        limit = self.max_jobs.value()
+        running = sum(job.state == JOB_RUNNING for job in self.jobs)
+        for job in self.jobs:
+            if running >= limit:
+                break
+            if job.state == JOB_QUEUED:
+                # Parallel jobs share the CPU cores instead of each using all of them
+                job.workers = max(1, DEFAULT_WORKERS // limit)
+                job.state = JOB_RUNNING
+                job.start()
+                running += 1
+                self.update_job_row(job)
+        self.update_overall_progress()
+    
+    def job_progress(self, percent):
+        """Show a job's progress in its row and in the overall progress bar"""
+        job = self.sender()
+        job.percent = percent
+        self.update_job_row(job)
+        self.update_overall_progress()
+    
+    def job_status(self, message):
+        """Log a job's status message, numbered so parallel jobs can be told apart"""
+        self.status_text.append(f"[{self.sender().number}] {message}")
+    
+    def job_rate(self, rate, eta):
+        """Remember a job's throughput and estimated time left"""
+        job = self.sender()
+        job.speed = rate
+        job.eta = eta
+        self.update_job_row(job)
+        self.update_overall_progress()
+    
+    def job_finished(self, success, message):
+        """Record how a job ended and start the next queued one"""
+        job = self.sender()
+        if job not in self.jobs:
+            return
         
         if success:
-            QMessageBox.information(self, "Success", message)
+            job.state = JOB_DONE
+            job.percent = 100
+        elif job.cancel.cancelled:
+            job.state = JOB_CANCELLED
+            message = "Cancelled, nothing was saved."
         else:
-            QMessageBox.critical(self, "Error", message)
+            job.state = JOB_FAILED
+        job.speed = 0.0
+        job.message = message
+        if job.state == JOB_DONE:
+            # The job already logged its success, so only add where the output went
+            for line in message.splitlines()[1:]:
+                self.status_text.append(f"[{job.number}] 📂 {line}")
+        else:
+            self.status_text.append(f"[{job.number}] {'❌' if job.state == JOB_FAILED else '⏹️'} {message}")
+        self.update_job_row(job)
+        self.start_jobs()
+        self.check_batch_finished()
+    
+    def check_batch_finished(self):
+        """Once no job is queued or running, report the results of the batch"""
+        if any(job.state in (JOB_QUEUED, JOB_RUNNING) for job in self.jobs):
+            return
+        batch, self.batch = self.batch, []
+        self.progress_bar.setVisible(False)
+        self.cancel_btn.setVisible(False)
+        self.update_queue_title()
+        if not batch:
+            return
+        
+        # A single job keeps the usual message box; a batch gets one summary
+        if len(batch) == 1:
+            if batch[0].state == JOB_DONE:
+                QMessageBox.information(self, "Success", batch[0].message)
+            elif batch[0].state == JOB_FAILED:
+                QMessageBox.critical(self, "Error", batch[0].message)
+            return
+        counts = {state: sum(job.state == state for job in batch) for state in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)}
+        QMessageBox.information(self, "Queue Finished",
+                                f"{len(batch)} jobs finished: {counts[JOB_DONE]} succeeded, "
+                                f"{counts[JOB_FAILED]} failed, {counts[JOB_CANCELLED]} cancelled.\n"
+                                f"See the Queue tab for details.")
+    
+    def add_job_row(self, job):
+        """Append a row for a new job to the queue table"""
+        row = self.queue_table.rowCount()
+        self.queue_table.insertRow(row)
+        self.queue_table.setItem(row, 0, QTableWidgetItem(str(job.number)))
+        self.queue_table.setItem(row, 1, QTableWidgetItem(job.title))
+        self.queue_table.setItem(row, 2, QTableWidgetItem())
+        self.queue_table.setItem(row, 4, QTableWidgetItem())
+        
+        progress_bar = QProgressBar()
+        progress_bar.setStyleSheet(self.progress_bar.styleSheet())
+        self.queue_table.setCellWidget(row, 3, progress_bar)
+        self.update_job_row(job)
+    
+    def update_job_row(self, job):
+        """Show a job's state, progress and speed in its row"""
+        row = self.jobs.index(job)
+        self.queue_table.item(row, 2).setText(job.state)
+        self.queue_table.item(row, 2).setToolTip(job.message)
+        self.queue_table.cellWidget(row, 3).setValue(job.percent)
+        
+        speed = ""
+        if job.state == JOB_RUNNING and job.speed:
+            speed = f"{format_size(job.speed)}/s"
+            if job.eta >= 0:
+                speed += f", {format_duration(job.eta)} left"
+        self.queue_table.item(row, 4).setText(speed)
+        self.update_queue_title()
+    
+    def update_queue_title(self):
+        """Show how many jobs are still queued or running in the Queue tab title"""
+        active = sum(job.state in (JOB_QUEUED, JOB_RUNNING) for job in self.jobs)
+        self.tab_widget.setTabText(self.tab_widget.indexOf(self.queue_tab),
+                                   f"📋 Queue ({active})" if active else "📋 Queue")
+    
+    def update_overall_progress(self):
+        """Show the progress of the whole batch, its combined speed and the jobs left"""
+        if not self.batch:
+            return
+        self.progress_bar.setVisible(True)
+        self.cancel_btn.setVisible(True)
+        self.cancel_btn.setEnabled(True)
+        
+        # Finished jobs count as complete, whether they succeeded or not
+        running = [job for job in self.batch if job.state == JOB_RUNNING]
+        queued = sum(job.state == JOB_QUEUED for job in self.batch)
+        total = sum(job.percent if job.state in (JOB_QUEUED, JOB_RUNNING) else 100 for job in self.batch)
+        self.progress_bar.setValue(total // len(self.batch))
+        
+        text = "%p%"
+        speed = sum(job.speed for job in running)
+        if speed:
+            text += f"  ·  {format_size(speed)}/s"
+            if not queued and all(job.eta >= 0 for job in running):
+                text += f", about {format_duration(max(job.eta for job in running))} left"
+        if len(self.batch) > 1:
+            text += f"  ·  {len(running)} running, {queued} queued"
+        self.progress_bar.setFormat(text)
+    
+    def cancel_selected(self):
+        """Cancel the jobs selected in the queue table"""
+        rows = sorted({index.row() for index in self.queue_table.selectedIndexes()})
+        self.cancel_jobs([self.jobs[row] for row in rows])
+    
+    def cancel_all(self):
+        """Cancel every queued and running job"""
+        self.cancel_jobs(self.jobs)
+        self.cancel_btn.setEnabled(False)
+    
+    def cancel_jobs(self, jobs):
+        """Drop queued jobs and ask running ones to stop at their next chunk"""
+        for job in jobs:
+            if job.state == JOB_QUEUED:
+                job.state = JOB_CANCELLED
+                job.message = "Cancelled before it started."
+                self.status_text.append(f"[{job.number}] ⏹️ {job.message}")
+                self.update_job_row(job)
+            elif job.state == JOB_RUNNING and not job.cancel.cancelled:
+                job.cancel.cancel()
+                self.status_text.append(f"[{job.number}] ⏹️ Cancelling...")
+        self.update_overall_progress()
+        self.check_batch_finished()
+    
+    def clear_finished(self):
+        """Remove finished jobs from the queue table"""
+        self.jobs = [job for job in self.jobs if job.state in (JOB_QUEUED, JOB_RUNNING)]
+        self.queue_table.setRowCount(0)
+        for job in self.jobs:
+            self.add_job_row(job)
+    
+    def dragEnterEvent(self, event):
+        """Accept files dragged onto the window"""
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+    
+    def dropEvent(self, event):
+        """Queue dropped files: concealed in the selected cover on the Conceal tab, otherwise revealed"""
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        paths = [path for path in paths if os.path.isfile(path)]
+        if not paths:
+            return
+        event.acceptProposedAction()
+        
+        if self.tab_widget.currentWidget() is self.conceal_tab:
+            self.queue_conceal(paths)
+            return
+        images = [path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS)]
+        if len(images) < len(paths):
+            self.status_text.append(f"⚠️ Skipped {len(paths) - len(images)} dropped file(s) that are not images")
+        if images:
+            self.queue_reveal(images)
     
     def go_back(self):
         """Return to the main window"""
-        # Stop any running threads
-        if self.conceal_thread and self.conceal_thread.isRunning():
-            self.conceal_thread.terminate()
-        if self.reveal_thread and self.reveal_thread.isRunning():
-            self.reveal_thread.terminate()
+        # Stop queued and running jobs and let them remove their partial output
+        self.batch = []
+        self.cancel_jobs(self.jobs)
+        for job in self.jobs:
+            job.wait()
+        self.jobs = []
+        self.queue_table.setRowCount(0)
         
         self.close()
         if self.parent_window: